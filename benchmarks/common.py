@@ -0,0 +1,91 @@
+"""Helpers shared by the benchmark suite (micro.py, load.py, compare.py).
+
+Benchmarks that write run against their own database, passed with
+--database, never the one in db.env: the table is truncated and seeded.
+Create it once with `createdb minha_tabela_bench`.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+sys.path.insert(0, str(SRC))
+
+
+def use_database(name):
+    """Point crud.connect_kwargs() (and child processes) at the benchmark database"""
+    if not name:
+        raise SystemExit("--database is required: benchmarks truncate and reseed minha_tabela")
+    # Import first so db.env is loaded; load_dotenv does not override what is set here
+    import crud  # noqa: F401
+    os.environ["DB_NAME"] = name
+
+
+def seed(db, rows, batch=10_000):
+    """Replace the contents of minha_tabela with `rows` synthetic records and return their ids"""
+    with db.cursor() as cur:
+        cur.execute("TRUNCATE minha_tabela RESTART IDENTITY")
+    ids = []
+    for start in range(0, rows, batch):
+        chunk = [(f"Pessoa {i}", 18 + i % 60) for i in range(start, min(rows, start + batch))]
+        ids.extend(db.insert_many(chunk))
+    with db.cursor() as cur:
+        cur.execute("ANALYZE minha_tabela")
+    return ids
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    """min/p50/p95/p99/max of latencies in seconds, reported in milliseconds"""
+    values = sorted(latencies)
+    if not values:
+        return {"min_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    return {
+        "min_ms": values[0] * 1000,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(kind, results, args, output=None):
+    """Write results with the run metadata to `output`, or to results/<kind>-<time>-<rev>.json"""
+    revision = git_revision()
+    document = {
+        "kind": kind,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "results": results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{revision or 'unknown'}.json"
+    Path(output).write_text(json.dumps(document, indent=2, default=str))
+    return output
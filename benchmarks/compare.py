@@ -0,0 +1,70 @@
+"""Compare two benchmark result files and flag regressions.
+
+Results are matched by name. Latencies (*_ms) and errors regress when
+they grow, throughput (rps, ops_per_s, speedup) when it shrinks, by more
+than --threshold. Exits with status 1 if anything regressed.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/load-old.json benchmarks/results/load-new.json [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+HIGHER_IS_BETTER = ("rps", "ops_per_s", "speedup")
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "standard_ms", "fast_ms", "decode_ms", "errors")
+
+
+def flatten(results):
+    """name -> metrics, for both the list (load) and grouped dict (micro) layouts"""
+    groups = results.values() if isinstance(results, dict) else [results]
+    return {entry["name"]: entry for group in groups for entry in group}
+
+
+def compare(old, new, threshold):
+    rows = []
+    for name, new_entry in new.items():
+        old_entry = old.get(name)
+        if old_entry is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            before, after = old_entry.get(metric), new_entry.get(metric)
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                continue
+            if before == 0:
+                change = 0.0 if after == 0 else float("inf")
+            else:
+                change = (after - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((name, metric, before, after, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--all", action="store_true", help="also print metrics that did not regress")
+    args = parser.parse_args()
+
+    old = json.loads(Path(args.old).read_text())
+    new = json.loads(Path(args.new).read_text())
+    if old["kind"] != new["kind"]:
+        parser.error(f"cannot compare a {old['kind']} run with a {new['kind']} run")
+    print(f"{old['git_revision']} ({old['created_at']}) -> {new['git_revision']} ({new['created_at']})")
+
+    rows = compare(flatten(old["results"]), flatten(new["results"]), args.threshold)
+    regressions = 0
+    for name, metric, before, after, change, regressed in rows:
+        regressions += regressed
+        if regressed or args.all:
+            flag = "REGRESSION" if regressed else ""
+            print(f"{name:>36} {metric:>10} {before:12.2f} -> {after:12.2f} {change:+8.1%} {flag}")
+    print(f"{regressions} regression(s) over {len(rows)} compared metrics (threshold {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
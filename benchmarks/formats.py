@@ -0,0 +1,94 @@
+"""Payload size and client decode time of the /items list formats.
+
+Encodes synthetic pages shaped like minha_tabela rows in each format the
+API can send (row JSON, columnar JSON, MessagePack), each one raw, gzip
+and brotli compressed, and times how long a client takes to get rows back
+(decompression plus formats.decode_page). Formats whose package is not
+installed are skipped.
+
+Usage:
+    python benchmarks/formats.py [--sizes 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import formats
+from compression import Compressor, brotli
+
+COLUMNS = ("id", "nome", "idade")
+
+
+def make_page(size):
+    return {
+        "items": [{"id": i, "nome": f"Pessoa {i}", "idade": 18 + i % 60} for i in range(1, size + 1)],
+        "next_cursor": str(size),
+    }
+
+
+def encode(page, media_type):
+    if media_type == formats.JSON:
+        return formats.dumps(page)
+    return formats.encode(formats.columnar_page(page, COLUMNS), media_type)
+
+
+def decompress(body, coding):
+    if coding == "gzip":
+        return zlib.decompress(body, 31)
+    if coding == "br":
+        return brotli.decompress(body)
+    return body
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes, repeat):
+    media_types = [formats.JSON] + formats.compact_formats()
+    codings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    results = []
+    for size in sizes:
+        page = make_page(size)
+        for media_type in media_types:
+            raw = encode(page, media_type)
+            assert formats.decode_page(raw, media_type) == page
+            for coding in codings:
+                body = raw if coding == "identity" else Compressor(coding).finish(raw)
+                decode_time = best_of(lambda: formats.decode_page(decompress(body, coding), media_type), repeat)
+                results.append({
+                    "rows": size,
+                    "format": media_type,
+                    "encoding": coding,
+                    "bytes": len(body),
+                    "decode_ms": decode_time * 1000,
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"json encoder: {'orjson' if formats.orjson is not None else 'json'}, "
+          f"msgpack: {'yes' if formats.msgpack is not None else 'not installed'}, "
+          f"brotli: {'yes' if brotli is not None else 'not installed'}")
+    print(f"{'rows':>8} {'format':<44} {'encoding':>8} {'bytes':>11} {'decode ms':>10}")
+    for result in run(args.sizes, args.repeat):
+        print(f"{result['rows']:>8} {result['format']:<44} {result['encoding']:>8} "
+              f"{result['bytes']:>11} {result['decode_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Load generator driving every route of main.py.
+
+Starts the API with uvicorn against the benchmark database (or targets a
+running server with --url), seeds minha_tabela, then runs each scenario
+in turn: `--requests` requests sent by `--concurrency` concurrent workers.
+Reports throughput, p50/p95/p99 latency and errors per scenario.
+
+The /items/events stream is left out: it is a long-lived connection, not
+a request/response route.
+
+Usage:
+    python benchmarks/load.py --database minha_tabela_bench [--rows 10000] [--requests 2000] [--concurrency 32]
+    python benchmarks/load.py --database minha_tabela_bench --only items_get items_search
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import SRC, save_results, seed, summarize, use_database
+
+# Records each request of the delete scenarios removes, inserted just before the scenario runs
+SPARE_PER_REQUEST = {"delete_query": 1, "item_delete": 1, "items_bulk_delete": None}
+# Concurrency of the writers_x<n> scenarios: single-row PATCHes of distinct rows.
+# Every write statement locks the table_version row until COMMIT, so their
+# throughput levels off instead of growing with n.
+WRITER_CONCURRENCY = {f"writers_x{n}": n for n in (1, 4, 16, 64)}
+
+MSGPACK_ACCEPT = {"Accept": "application/msgpack, application/vnd.minha-tabela.columnar+json;q=0.9"}
+
+
+def scenarios(ids, spare, batch):
+    """name -> request(i) returning (method, path, httpx keyword arguments).
+
+    `ids` are seeded records that stay in the table; `spare` are extra
+    records each delete scenario consumes, so deletes always hit a row.
+    """
+    def item(i):
+        return ids[i % len(ids)]
+
+    def take(i):
+        return spare.pop()
+
+    def take_batch(i):
+        return [spare.pop() for _ in range(min(batch, len(spare)))]
+
+    records = [{"nome": f"Bulk {n}", "idade": 18 + n % 60} for n in range(batch)]
+    return {
+        "select_query": lambda i: ("GET", "/select", {"params": {"limit": 100}}),
+        "items_get": lambda i: ("GET", "/items", {"params": {"limit": 100}}),
+        "items_get_after": lambda i: ("GET", "/items", {"params": {"limit": 100, "after": str(item(i))}}),
+        "items_get_msgpack": lambda i: ("GET", "/items", {"params": {"limit": 1000}, "headers": MSGPACK_ACCEPT}),
+        "items_search": lambda i: ("GET", "/items", {"params": {"nome": "pessoa 1", "idade_min": 30, "sort": "-idade"}}),
+        "items_export": lambda i: ("GET", "/items/export", {}),
+        "items_stats": lambda i: ("GET", "/items/stats", {}),
+        "item_get": lambda i: ("GET", f"/items/{item(i)}", {}),
+        "insert_query": lambda i: ("POST", "/insert", {"params": {"nome": f"Load {i}", "idade": 30}}),
+        "items_post": lambda i: ("POST", "/items", {"json": {"nome": f"Load {i}", "idade": 30}}),
+        "items_bulk_post": lambda i: ("POST", "/items/bulk", {"json": records}),
+        "update_query": lambda i: ("PUT", "/update", {"params": {"id": item(i), "nome": f"Pessoa {i}", "idade": 31}}),
+        "item_put": lambda i: ("PUT", f"/items/{item(i)}", {"json": {"nome": f"Pessoa {i}", "idade": 32}}),
+        "item_patch": lambda i: ("PATCH", f"/items/{item(i)}", {"json": {"idade": 33}}),
+        "items_bulk_patch": lambda i: ("PATCH", "/items/bulk", {"json": [{"id": id, "idade": 34} for id in ids[:batch]]}),
+        "delete_query": lambda i: ("DELETE", "/delete", {"params": {"id": take(i)}}),
+        "item_delete": lambda i: ("DELETE", f"/items/{take(i)}", {}),
+        "items_bulk_delete": lambda i: ("DELETE", "/items/bulk", {"json": take_batch(i)}),
+        **{name: (lambda i: ("PATCH", f"/items/{item(i)}", {"json": {"idade": 18 + i % 60}}))
+           for name in WRITER_CONCURRENCY},
+        "db_stats": lambda i: ("GET", "/db/stats", {}),
+        "cache_stats": lambda i: ("GET", "/cache/stats", {}),
+        "metrics": lambda i: ("GET", "/metrics", {}),
+    }
+
+
+async def run_scenario(http, request, requests, concurrency):
+    counter = itertools.count()
+    latencies = []
+    errors = {}
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            method, path, kwargs = request(i)
+            start = time.perf_counter()
+            try:
+                response = await http.request(method, path, **kwargs)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                    continue
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else None,
+        **summarize(latencies),
+    }
+
+
+def start_server(port, env):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SRC, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("API server exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/db/stats", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("API server did not start within 30 s")
+
+
+async def run(args, db, ids):
+    connections = max([args.concurrency, *WRITER_CONCURRENCY.values()])
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as http:
+        for name in args.only or list(scenarios(ids, [], args.batch)):
+            spare = []
+            if name in SPARE_PER_REQUEST:
+                count = args.requests * (SPARE_PER_REQUEST[name] or args.batch)
+                spare = db.insert_many([(f"Spare {n}", 30) for n in range(count)])
+            request = scenarios(ids, spare, args.batch)[name]
+            concurrency = WRITER_CONCURRENCY.get(name, args.concurrency)
+            result = {"name": name, "concurrency": concurrency,
+                      **await run_scenario(http, request, args.requests, concurrency)}
+            results.append(result)
+            p50 = f"{result['p50_ms']:8.2f}" if result["p50_ms"] is not None else "       -"
+            p99 = f"{result['p99_ms']:8.2f}" if result["p99_ms"] is not None else "       -"
+            print(f"{name:>20} {result['rps']:9.0f} req/s  p50 {p50} ms  p99 {p99} ms  errors {result['errors']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", required=True, help="database to truncate and seed (not the one in db.env)")
+    parser.add_argument("--url", help="target a running API instead of starting one (it must use --database)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=10_000, help="records seeded before the run")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=100, help="records per bulk request")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--only", nargs="+", help="scenarios to run (default: all)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/load-<time>-<rev>.json)")
+    args = parser.parse_args()
+    unknown = set(args.only or ()) - set(scenarios([], [], 0))
+    if unknown:
+        parser.error("unknown scenarios: " + ", ".join(sorted(unknown)))
+
+    use_database(args.database)
+    from crud import Database
+    from schema import migrate
+
+    migrate()
+    db = Database(minconn=1, maxconn=2)
+    server = None
+    try:
+        ids = seed(db, args.rows)
+        if args.url is None:
+            args.url = f"http://127.0.0.1:{args.port}"
+            server = start_server(args.port, dict(os.environ))
+        results = asyncio.run(run(args, db, ids))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        db.close()
+    print(f"Saved {save_results('load', results, args, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
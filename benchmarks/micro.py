@@ -0,0 +1,122 @@
+"""Micro-benchmarks of every crud.Database method and of response serialization.
+
+For each table size the benchmark database is truncated and seeded, then
+each method is called repeatedly on a single connection pool and its
+latency distribution recorded. Serialization is measured on pages of the
+same sizes with benchmarks/serialization.py and benchmarks/formats.py.
+
+Usage:
+    python benchmarks/micro.py --database minha_tabela_bench [--sizes 1000 10000 100000] [--calls 200]
+"""
+import argparse
+import importlib.util
+import time
+from pathlib import Path
+
+from common import save_results, seed, summarize, use_database
+
+BENCHMARKS = Path(__file__).resolve().parent
+
+
+def load_benchmark(name):
+    """Import a sibling benchmark script without clashing with the src module of the same name"""
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", BENCHMARKS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(name, rows, func, calls):
+    """Call func(i) `calls` times and summarize the latencies"""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    return {"name": f"{name}@{rows}", "method": name, "rows": rows, "calls": calls,
+            "ops_per_s": calls / total if total else None, **summarize(latencies)}
+
+
+def database_cases(db, ids, calls, batch):
+    """(name, func(i), calls) for each Database method; writes restore what they change"""
+    middle = ids[len(ids) // 2]
+    heavy = max(1, calls // 20)
+    spare = []
+
+    def insert(i):
+        spare.append(db.insert_data(f"Bench {i}", 30)["id"])
+
+    def delete(i):
+        db.delete_data(spare.pop())
+
+    def insert_many(i):
+        spare.extend(db.insert_many([(f"Bench {i}-{n}", 30) for n in range(batch)]))
+
+    def delete_many(i):
+        db.delete_many([spare.pop() for _ in range(min(batch, len(spare)))])
+
+    def iter_rows(i):
+        for _ in db.iter_rows():
+            pass
+
+    return [
+        ("select_all", lambda i: db.select_all(), heavy),
+        ("iter_rows", iter_rows, heavy),
+        ("select_page", lambda i: db.select_page(100), calls),
+        ("select_page_after", lambda i: db.select_page(100, middle), calls),
+        ("search_prefix", lambda i: db.search(100, nome="pessoa 12"), calls),
+        ("search_substring", lambda i: db.search(100, q="ssoa 4"), calls),
+        ("search_idade_sorted", lambda i: db.search(100, idade_min=30, idade_max=40, sort="-idade"), calls),
+        ("select_by_id", lambda i: db.select_by_id(ids[i % len(ids)]), calls),
+        ("update_data", lambda i: db.update_data(ids[i % len(ids)], idade=18 + i % 60), calls),
+        ("update_many", lambda i: db.update_many([(id, None, 18 + i % 60) for id in ids[:batch]]), heavy),
+        ("insert_data", insert, calls),
+        ("delete_data", delete, calls),
+        ("insert_many", insert_many, heavy),
+        ("delete_many", delete_many, heavy),
+        ("stats_summary", lambda i: db.stats(), calls),
+        ("stats_table", lambda i: db.stats(source="table"), heavy),
+        ("table_version", lambda i: db.table_version(), calls),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", required=True, help="database to truncate and seed (not the one in db.env)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--calls", type=int, default=200, help="calls per cheap method; heavy ones get 1/20")
+    parser.add_argument("--batch", type=int, default=1000, help="records per insert_many/update_many/delete_many")
+    parser.add_argument("--repeat", type=int, default=5, help="serialization repetitions (best of)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/micro-<time>-<rev>.json)")
+    args = parser.parse_args()
+
+    use_database(args.database)
+    from crud import Database
+    from schema import migrate
+
+    migrate()
+    db = Database()
+    results = {"database": [], "serialization": [], "formats": []}
+    try:
+        for rows in args.sizes:
+            ids = seed(db, rows)
+            for name, func, calls in database_cases(db, ids, args.calls, min(args.batch, rows)):
+                result = measure(name, rows, func, calls)
+                results["database"].append(result)
+                print(f"{result['name']:>28} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                      f"{result['ops_per_s']:9.0f} ops/s")
+    finally:
+        db.close()
+
+    for result in load_benchmark("serialization").run(args.sizes, args.repeat):
+        results["serialization"].append({"name": f"serialization@{result['rows']}", **result})
+    for result in load_benchmark("formats").run(args.sizes, args.repeat):
+        name = f"{result['format']}+{result['encoding']}@{result['rows']}"
+        results["formats"].append({"name": name, **result})
+
+    print(f"Saved {save_results('micro', results, args, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
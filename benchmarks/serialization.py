@@ -0,0 +1,81 @@
+"""Micro-benchmark of the /items list serialization paths.
+
+Compares FastAPI's default path for a response_model route (pydantic
+validation + jsonable_encoder + json.dumps) with FastJSONResponse, on
+synthetic pages shaped like minha_tabela rows.
+
+Usage:
+    python benchmarks/serialization.py [--sizes 10000 100000] [--repeat 5]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from fastapi.encoders import jsonable_encoder
+from models import ItemPage
+from serialization import FastJSONResponse
+from formats import orjson
+
+
+def make_page(size):
+    return {
+        "items": [{"id": i, "nome": f"Pessoa {i}", "idade": 18 + i % 60} for i in range(1, size + 1)],
+        "next_cursor": str(size),
+    }
+
+
+def standard(page):
+    """What FastAPI does for a response_model route returning a dict"""
+    content = jsonable_encoder(ItemPage(**page))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast(page):
+    return FastJSONResponse(page).body
+
+
+def best_of(func, page, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func(page)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+
+def run(sizes, repeat):
+    results = []
+    for size in sizes:
+        page = make_page(size)
+        std_time, std_bytes = best_of(standard, page, repeat)
+        fast_time, fast_bytes = best_of(fast, page, repeat)
+        assert json.loads(standard(page)) == json.loads(fast(page))
+        results.append({
+            "rows": size,
+            "standard_ms": std_time * 1000,
+            "fast_ms": fast_time * 1000,
+            "speedup": std_time / fast_time,
+            "bytes": fast_bytes,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'rows':>8} {'standard ms':>12} {'fast ms':>10} {'speedup':>8} {'bytes':>11}")
+    for result in run(args.sizes, args.repeat):
+        print(f"{result['rows']:>8} {result['standard_ms']:>12.1f} {result['fast_ms']:>10.1f} "
+              f"{result['speedup']:>7.1f}x {result['bytes']:>11}")
+
+
+if __name__ == "__main__":
+    main()
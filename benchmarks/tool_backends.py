@@ -0,0 +1,73 @@
+"""Benchmark of the agent tool backends: HTTP loopback vs in-process.
+
+Runs the same tool calls through agent.call_function with each backend,
+so the timings include argument parsing and result formatting exactly as
+the agent pays them. Needs the API running at API_URL and the database
+settings from db.env. Records created by the benchmark are deleted again.
+
+Usage:
+    python benchmarks/tool_backends.py [--calls 200] [--page-size 100]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import agent
+from cache import TTLCache
+from tool_backends import HttpToolBackend, LocalToolBackend
+
+
+def timed(name, arguments):
+    start = time.perf_counter()
+    result = agent.call_function(name, json.dumps(arguments))
+    elapsed = time.perf_counter() - start
+    if result.startswith("Error"):
+        raise RuntimeError(result)
+    return elapsed
+
+
+def run_backend(backend, calls, page_size):
+    agent.use_backend(backend)
+    created = backend.create_item("Benchmark", 30)["item"]["id"]
+    timings = {name: [] for name in ("list_items", "get_item", "update_item", "create_item", "delete_item")}
+    try:
+        for i in range(calls):
+            timings["list_items"].append(timed("list_items", {"limit": page_size}))
+            timings["get_item"].append(timed("get_item", {"item_id": created}))
+            timings["update_item"].append(timed("update_item", {"item_id": created, "idade": 18 + i % 60}))
+            start = time.perf_counter()
+            new_id = backend.create_item(f"Benchmark {i}", 30)["item"]["id"]
+            timings["create_item"].append(time.perf_counter() - start)
+            timings["delete_item"].append(timed("delete_item", {"item_id": new_id}))
+    finally:
+        backend.delete_item(created)
+    return {name: statistics.median(values) * 1000 for name, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    local = LocalToolBackend(cache=TTLCache(maxsize=10000, ttl=60))
+    results = {
+        "http": run_backend(HttpToolBackend(), args.calls, args.page_size),
+        "local": run_backend(local, args.calls, args.page_size),
+    }
+    local.db.close()
+
+    print(f"median ms per call over {args.calls} calls")
+    print(f"{'tool':>12} {'http':>8} {'local':>8} {'speedup':>8}")
+    for name in results["http"]:
+        http_ms, local_ms = results["http"][name], results["local"][name]
+        print(f"{name:>12} {http_ms:>8.2f} {local_ms:>8.2f} {http_ms / local_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
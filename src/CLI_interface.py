@@ -1,32 +1,30 @@
-import requests
 from requests.exceptions import HTTPError
- 
-API_URL = "http://127.0.0.1:8000"
+from api_client import client
 
 def listar_dados():
-    response = requests.get(f"{API_URL}/items")
     print("\nDados no banco:")
-    for row in response.json():
+    for row in client.iter_items():
         print(row)
 
 def inserir_dados():
     nome = input("Nome: ")
     idade = int(input("Idade: "))  # Convert to int
     data = {"nome": nome, "idade": idade}
-    response = requests.post(f"{API_URL}/items", json=data)
-    print(response.json()["message"])
+    response = client.post("/items", json=data)
+    body = response.json()
+    print(f"{body['message']} (ID {body['item']['id']})")
 
 def atualizar_dados():
     id = int(input("ID do registro a atualizar: "))
     nome = input("Novo Nome: ")
     idade = int(input("Nova Idade: "))
     data = {"nome": nome, "idade": idade}
-    response = requests.put(f"{API_URL}/items/{id}", json=data)
+    response = client.put(f"/items/{id}", json=data)
     print(response.json()["message"])
 
 def deletar_dados():
     id = int(input("ID do registro a deletar: "))
-    response = requests.delete(f"{API_URL}/items/{id}")
+    response = client.delete(f"/items/{id}")
     print(response.json()["message"])
 
 def menu():
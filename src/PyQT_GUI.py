@@ -1,74 +1,165 @@
 # Example with PySide6
-from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QTableWidget, QTableWidgetItem
-from PySide6.QtCore import QObject, Signal, Slot, QRunnable, QThreadPool
-import requests
+from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QTableView
+from PySide6.QtCore import QObject, Signal, Slot, QRunnable, QThreadPool, QAbstractTableModel, QModelIndex, Qt
+from array import array
 import sys
 import json
+from api_client import client
+
+# Records requested from the API each time the view scrolls near the end
+PAGE_SIZE = 500
 
 class WorkerSignals(QObject):
     finished = Signal(object)
     error = Signal(str)
 
 class APIWorker(QRunnable):
-    def __init__(self, url):
+    def __init__(self, path, params=None):
         super().__init__()
-        self.url = url
+        self.path = path
+        self.params = params
         self.signals = WorkerSignals()
-        
+
     def run(self):
         try:
-            response = requests.get(self.url)
-            data = response.json()
+            # Pages arrive column by column, ready to be appended to the model's arrays
+            data, response = client.get_page(self.path, params=self.params, columns=True)
+            response.raise_for_status()
             self.signals.finished.emit(data)
         except Exception as e:
             self.signals.error.emit(str(e))
 
+class ItemTableModel(QAbstractTableModel):
+    """Table model loading /items one page at a time as the view scrolls.
+
+    Records are kept column-wise (arrays for the integer columns, a list of
+    strings for nome) instead of as one widget per cell, and the view only
+    asks for the cells that are visible.
+    """
+    HEADERS = ["ID", "Nome", "Idade"]
+    error = Signal(str)
+
+    def __init__(self, threadpool, parent=None):
+        super().__init__(parent)
+        self.threadpool = threadpool
+        self.ids = array("q")
+        self.nomes = []
+        self.idades = array("q")
+        self.next_cursor = None
+        self.has_more = True
+        # Signals of the in-flight page request; results from older requests are ignored
+        self.pending = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        column = index.column()
+        if column == 0:
+            return str(self.ids[row])
+        if column == 1:
+            return self.nomes[row]
+        return str(self.idades[row])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and self.pending is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        params = {"limit": PAGE_SIZE}
+        if self.next_cursor is not None:
+            params["after"] = self.next_cursor
+        worker = APIWorker("/items", params)
+        worker.signals.finished.connect(self.append_page)
+        worker.signals.error.connect(self.page_failed)
+        self.pending = worker.signals
+        self.threadpool.start(worker)
+
+    @Slot(object)
+    def append_page(self, page):
+        if self.sender() is not self.pending:
+            return
+        self.pending = None
+        columns = page["columns"]
+        count = len(columns.get("id", ()))
+        if count:
+            first = len(self.ids)
+            self.beginInsertRows(QModelIndex(), first, first + count - 1)
+            self.ids.extend(columns["id"])
+            self.nomes.extend(columns["nome"])
+            self.idades.extend(columns["idade"])
+            self.endInsertRows()
+        self.next_cursor = page["next_cursor"]
+        self.has_more = self.next_cursor is not None
+
+    @Slot(str)
+    def page_failed(self, error):
+        if self.sender() is not self.pending:
+            return
+        self.pending = None
+        self.has_more = False
+        self.error.emit(error)
+
+    def reload(self):
+        """Drop the loaded records and start again from the first page"""
+        self.beginResetModel()
+        self.ids = array("q")
+        self.nomes = []
+        self.idades = array("q")
+        self.next_cursor = None
+        self.has_more = True
+        self.pending = None
+        self.endResetModel()
+        self.fetchMore()
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        
+
         self.setWindowTitle("API Client")
         self.setGeometry(100, 100, 800, 500)
-        
+
         # Layout
         layout = QVBoxLayout()
-        
+
         # Refresh button
         self.refresh_button = QPushButton("Refresh Data")
         self.refresh_button.clicked.connect(self.refresh_data)
         layout.addWidget(self.refresh_button)
-        
-        # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["ID", "Nome", "Idade"])
+
+        # Thread pool for async operations
+        self.threadpool = QThreadPool()
+
+        # Table, backed by a lazily paged model
+        self.model = ItemTableModel(self.threadpool)
+        self.model.error.connect(self.show_error)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         layout.addWidget(self.table)
-        
+
         # Set central widget
         container = QWidget()
         container.setLayout(layout)
         self.setCentralWidget(container)
-        
-        # Thread pool for async operations
-        self.threadpool = QThreadPool()
-        
+
         # Initial data load
         self.refresh_data()
-        
+
     def refresh_data(self):
-        worker = APIWorker("http://127.0.0.1:8000/items")
-        worker.signals.finished.connect(self.update_table)
-        worker.signals.error.connect(self.show_error)
-        self.threadpool.start(worker)
-    
-    def update_table(self, data):
-        self.table.setRowCount(0)
-        for row, item in enumerate(data):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(item["id"])))
-            self.table.setItem(row, 1, QTableWidgetItem(item["nome"]))
-            self.table.setItem(row, 2, QTableWidgetItem(str(item["idade"])))
-    
+        self.model.reload()
+
     def show_error(self, error):
         print(f"Error: {error}")
 
@@ -77,4 +168,4 @@ if __name__ == "__main__":
     app.setQuitOnLastWindowClosed(True) # Properly close the app when... Closed.
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
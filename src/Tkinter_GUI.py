@@ -1,10 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import requests
 import threading
 from agent import Agent
+from api_client import client
 
-API_URL = "http://127.0.0.1:8000"
+# Rows inserted, updated or removed in the Treeview per Tk event loop iteration
+CHUNK_SIZE = 500
 
 class ApiGui:
     def __init__(self, root):
@@ -94,8 +95,15 @@ class ApiGui:
         self.status_bar = ttk.Label(root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
-        # Create the agent
-        self.agent = Agent()
+        # ETag of the last full load, sent back as If-None-Match on refresh
+        self.etag = None
+        # Records currently shown, by Treeview iid (the record id as a string)
+        self.rows = {}
+        self.refreshing = False
+        self.refresh_pending = False
+
+        # Create the agent; its replies are streamed into the chat as they arrive
+        self.agent = Agent(callback=lambda text: self.root.after(0, self.append_stream_text, text))
         self.add_message("Assistant", "Hello! I can help you manage your database. Ask me questions or tell me to insert, update, or delete records.")
 
         # Load initial data
@@ -111,6 +119,13 @@ class ApiGui:
         self.chat_text.insert(tk.END, message)
         self.chat_text.see(tk.END)
         self.chat_text.config(state=tk.DISABLED)
+
+    def append_stream_text(self, text):
+        """Append streamed agent text to the message being written"""
+        self.chat_text.config(state=tk.NORMAL)
+        self.chat_text.insert(tk.END, text)
+        self.chat_text.see(tk.END)
+        self.chat_text.config(state=tk.DISABLED)
     
     def send_message(self, event=None):
         """Send a message to the agent and display the response"""
@@ -127,6 +142,9 @@ class ApiGui:
         # Disable the send button and input while processing
         self.send_btn.config(state=tk.DISABLED)
         self.chat_input.config(state=tk.DISABLED)
+
+        # Start an empty reply that streamed text is appended to
+        self.add_message("Assistant", "")
         
         # Process the query in a separate thread to avoid blocking the UI
         def process_query_thread():
@@ -140,9 +158,7 @@ class ApiGui:
         thread.start()
     
     def display_response(self, response):
-        """Display the agent's response and re-enable input"""
-        self.add_message("Assistant", response)
-        
+        """Re-enable input once the streamed response is complete"""
         # Re-enable the send button and input
         self.send_btn.config(state=tk.NORMAL)
         self.chat_input.config(state=tk.NORMAL)
@@ -156,23 +172,98 @@ class ApiGui:
     # /------------------
     # Functions to interact with the API
     def refresh_data(self):
-        """Fetch data from API and update the table"""
-        try:
-            response = requests.get(f"{API_URL}/items")
-            data = response.json()
-            
-            # Clear current table
-            for i in self.tree.get_children():
-                self.tree.delete(i)
-                
-            # Populate with new data
-            for item in data:
-                self.tree.insert("", tk.END, values=(item["id"], item["nome"], item["idade"]))
-            
-            self.status_var.set(f"Loaded {len(data)} records successfully")
-        except Exception as e:
-            self.status_var.set(f"Error loading data: {str(e)}")
-            messagebox.showerror("Error", f"Failed to fetch data: {str(e)}")
+        """Fetch data from the API on a background thread and apply it to the table"""
+        if self.refreshing:
+            # Coalesce refreshes requested while one is still running
+            self.refresh_pending = True
+            return
+        self.refreshing = True
+        self.status_var.set("Loading data...")
+        etag = self.etag
+
+        def fetch_thread():
+            try:
+                data, new_etag = self.fetch_items(etag)
+            except Exception as e:
+                self.root.after(0, lambda error=e: self.refresh_failed(error))
+            else:
+                self.root.after(0, lambda: self.apply_data(data, new_etag))
+
+        thread = threading.Thread(target=fetch_thread)
+        thread.daemon = True
+        thread.start()
+
+    def fetch_items(self, etag):
+        """Download every page; returns (None, etag) if the table did not change since `etag`"""
+        # The ETag tracks the whole table, so an unchanged first page means nothing changed
+        params = {"limit": 1000}
+        headers = {"If-None-Match": etag} if etag else {}
+        page, response = client.get_page("/items", params=params, headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        response.raise_for_status()
+        new_etag = response.headers.get("ETag")
+
+        data = []
+        while True:
+            data.extend(page["items"])
+            if page["next_cursor"] is None:
+                return data, new_etag
+            params["after"] = page["next_cursor"]
+            page, response = client.get_page("/items", params=params)
+            response.raise_for_status()
+
+    def apply_data(self, data, etag):
+        """Diff the fetched records against the table by id and only touch what changed"""
+        if data is None:
+            self.finish_refresh("Data is up to date")
+            return
+
+        new_rows = {str(item["id"]): (item["id"], item["nome"], item["idade"]) for item in data}
+        removed = [("delete", iid, None) for iid in self.rows if iid not in new_rows]
+        changed = []
+        added = []
+        for iid, values in new_rows.items():
+            current = self.rows.get(iid)
+            if current is None:
+                added.append(("insert", iid, values))
+            elif current != values:
+                changed.append(("update", iid, values))
+
+        self.rows = new_rows
+        self.etag = etag
+        summary = (f"Loaded {len(new_rows)} records "
+                   f"({len(added)} added, {len(changed)} updated, {len(removed)} removed)")
+        self.apply_changes(removed + changed + added, 0, summary)
+
+    def apply_changes(self, changes, start, summary):
+        """Apply row changes a chunk at a time, yielding to the Tk event loop in between"""
+        chunk = changes[start:start + CHUNK_SIZE]
+        deleted = [iid for action, iid, _ in chunk if action == "delete"]
+        if deleted:
+            self.tree.delete(*deleted)
+        for action, iid, values in chunk:
+            if action == "update":
+                self.tree.item(iid, values=values)
+            elif action == "insert":
+                self.tree.insert("", tk.END, iid=iid, values=values)
+        start += CHUNK_SIZE
+        if start < len(changes):
+            self.status_var.set(f"Loading data... {start}/{len(changes)} changes")
+            self.root.after(1, self.apply_changes, changes, start, summary)
+        else:
+            self.finish_refresh(summary)
+
+    def refresh_failed(self, error):
+        self.finish_refresh(f"Error loading data: {str(error)}")
+        messagebox.showerror("Error", f"Failed to fetch data: {str(error)}")
+
+    def finish_refresh(self, message):
+        self.status_var.set(message)
+        self.refreshing = False
+        if self.refresh_pending:
+            self.refresh_pending = False
+            self.refresh_data()
     
     def insert_data(self):
         """Open a dialog to insert new data"""
@@ -198,7 +289,7 @@ class ApiGui:
                 idade = int(idade_var.get())
                 
                 data = {"nome": nome, "idade": idade}
-                response = requests.post(f"{API_URL}/items", json=data)
+                response = client.post("/items", json=data)
                 
                 if response.status_code == 200:
                     self.status_var.set("Data inserted successfully")
@@ -246,7 +337,7 @@ class ApiGui:
                 idade = int(idade_var.get())
                 
                 data = {"nome": nome, "idade": idade}
-                response = requests.put(f"{API_URL}/items/{item_id}", json=data)
+                response = client.put(f"/items/{item_id}", json=data)
                 
                 if response.status_code == 200:
                     self.status_var.set("Data updated successfully")
@@ -275,7 +366,7 @@ class ApiGui:
             return
         
         try:
-            response = requests.delete(f"{API_URL}/items/{item_id}")
+            response = client.delete(f"/items/{item_id}")
             
             if response.status_code == 200:
                 self.status_var.set(f"Record #{item_id} deleted successfully")
@@ -1,43 +1,46 @@
-import requests
 import json
+import time
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Callable
 from openai import OpenAI
+from tool_backends import create_backend
 
-# API base URL
-BASE_URL = "http://127.0.0.1:8000"
+# Where the tools get their data: the REST API ("http") or crud.Database in
+# this process ("local"), selected with AGENT_TOOL_BACKEND
+backend = create_backend()
+
+def use_backend(new_backend):
+    """Route the agent tools through another backend, e.g. a LocalToolBackend sharing the API's pool and cache"""
+    global backend
+    backend = new_backend
 
 # Define functions that the agent can call to interact with the API
-def list_items():
-    """Get all items from the API"""
-    response = requests.get(f"{BASE_URL}/items")
-    return response.json()
+def list_items(limit: Optional[int] = None, after: Optional[str] = None, nome: Optional[str] = None,
+               q: Optional[str] = None, idade_min: Optional[int] = None, idade_max: Optional[int] = None,
+               sort: Optional[str] = None):
+    """Get a page of items from the API, optionally filtered and sorted"""
+    return backend.list_items(limit=limit, after=after, nome=nome, q=q, idade_min=idade_min, idade_max=idade_max, sort=sort)
+
+def get_stats(bucket: Optional[int] = None):
+    """Get the record count, idade min/max/average and an idade histogram"""
+    return backend.get_stats(bucket)
 
 def get_item(item_id: int):
     """Get a specific item by ID"""
-    response = requests.get(f"{BASE_URL}/items/{item_id}")
-    return response.json()
+    return backend.get_item(item_id)
 
 def create_item(nome: str, idade: int):
     """Create a new item"""
-    data = {"nome": nome, "idade": idade}
-    response = requests.post(f"{BASE_URL}/items", json=data)
-    return response.json()
+    return backend.create_item(nome, idade)
 
 def update_item(item_id: int, nome: Optional[str] = None, idade: Optional[int] = None):
     """Update an existing item"""
-    data = {}
-    if nome is not None:
-        data["nome"] = nome
-    if idade is not None:
-        data["idade"] = idade
-    
-    response = requests.put(f"{BASE_URL}/items/{item_id}", json=data)
-    return response.json()
+    return backend.update_item(item_id, nome=nome, idade=idade)
 
 def delete_item(item_id: int):
     """Delete an item"""
-    response = requests.delete(f"{BASE_URL}/items/{item_id}")
-    return response.json()
+    return backend.delete_item(item_id)
 
 # Define function schemas for the AI to use
 function_definitions = [
@@ -45,10 +48,32 @@ function_definitions = [
         "type": "function",
         "function": {
             "name": "list_items",
-            "description": "Get all items from the database",
+            "description": "Get a page of items from the database, filtered and sorted by the server (ordered by ID by default). Pass next_cursor from the previous result as 'after' to get the next page, with the same filters",
             "parameters": {
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "limit": {"type": "integer", "description": "Maximum number of items to return (optional)"},
+                    "after": {"type": "string", "description": "Cursor returned as next_cursor by the previous page (optional)"},
+                    "nome": {"type": "string", "description": "Only names starting with this text, case-insensitive (optional)"},
+                    "q": {"type": "string", "description": "Only names containing this text, case-insensitive (optional)"},
+                    "idade_min": {"type": "integer", "description": "Minimum age, inclusive (optional)"},
+                    "idade_max": {"type": "integer", "description": "Maximum age, inclusive (optional)"},
+                    "sort": {"type": "string", "enum": ["id", "-id", "nome", "-nome", "idade", "-idade"], "description": "Sort column, '-' prefix for descending (optional)"}
+                },
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_stats",
+            "description": "Get summary statistics computed by the database: number of records, minimum, maximum and average age (idade), and a histogram of ages. Use this instead of listing items to answer counting or average questions",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "bucket": {"type": "integer", "description": "Width of the histogram age ranges, default 10 (optional)"}
+                },
                 "required": []
             }
         }
@@ -117,89 +142,186 @@ function_definitions = [
 # Dictionary mapping function names to actual functions
 available_functions = {
     "list_items": list_items,
+    "get_stats": get_stats,
     "get_item": get_item,
     "create_item": create_item,
     "update_item": update_item,
     "delete_item": delete_item
 }
 
+# Maximum number of tool calls from one model reply that run at the same time
+MAX_TOOL_WORKERS = 8
+
+def call_function(function_name: str, arguments: str) -> str:
+    """Run one tool call and format its result with the time it took"""
+    start = time.perf_counter()
+    try:
+        if function_name not in available_functions:
+            return f"Error: Function {function_name} not found"
+        function_args = json.loads(arguments)
+        function_response = available_functions[function_name](**function_args)
+        elapsed = (time.perf_counter() - start) * 1000
+        return f"Result from {function_name} ({elapsed:.0f} ms):\n{json.dumps(function_response, indent=2)}"
+    except Exception as e:
+        elapsed = (time.perf_counter() - start) * 1000
+        return f"Error from {function_name} ({elapsed:.0f} ms): {str(e)}"
+
+def run_tool_calls(tool_calls, executor: ThreadPoolExecutor, on_done: Callable[[str], None] = None) -> List[str]:
+    """Run tool calls concurrently and return their results in the original order.
+
+    Calls on the same item_id are chained so they run one after another in the
+    order the model asked for them; everything else runs in parallel.
+    `on_done` is called with the function name as each call finishes.
+    """
+    chains = {}
+    for index, tool_call in enumerate(tool_calls):
+        try:
+            item_id = json.loads(tool_call.function.arguments).get("item_id")
+        except (json.JSONDecodeError, AttributeError):
+            item_id = None
+        key = ("item", item_id) if item_id is not None else ("call", index)
+        chains.setdefault(key, []).append(index)
+
+    results = [None] * len(tool_calls)
+
+    def run_chain(indexes):
+        for index in indexes:
+            function = tool_calls[index].function
+            results[index] = call_function(function.name, function.arguments)
+            if on_done is not None:
+                on_done(function.name)
+
+    for future in [executor.submit(run_chain, indexes) for indexes in chains.values()]:
+        future.result()
+    return results
+
 class Agent:
-    def __init__(self, callback: Callable[[str], None] = None):
+    def __init__(self, callback: Callable[[str], None] = None, max_tool_workers: int = MAX_TOOL_WORKERS):
         """
         Initialize the agent
         
         Args:
-            callback: Optional function to call with response text updates
+            callback: Optional function to call with response text updates. When
+                set, completions are streamed and the callback receives text as
+                it arrives: model tokens, tool-call progress, then tool results.
+            max_tool_workers: Maximum number of tool calls executed concurrently
         """
         self.client = OpenAI(
             base_url="http://localhost:1234/v1",  # Default LM Studio server address
             api_key="openthinker-7b"  # LM Studio doesn't require an actual API key locally
         )
         self.callback = callback
-        
-    def process_query(self, query: str) -> str:
+        self.executor = ThreadPoolExecutor(max_workers=max_tool_workers, thread_name_prefix="agent-tool")
+        # What was already sent to the callback for the current query
+        self.emitted = False
+        self.streamed_content = ""
+
+    def emit(self, text: str):
+        """Forward streamed text to the callback"""
+        if self.callback is not None and text:
+            self.emitted = True
+            self.callback(text)
+
+    def stream_completion(self, messages):
+        """Stream a completion, forwarding tokens and tool-call progress as they arrive.
+
+        Returns the full content and the tool calls assembled from the deltas.
+        """
+        stream = self.client.chat.completions.create(
+            model="local-model",  # ignored by LM Studio but required
+            messages=messages,
+            tools=function_definitions,
+            tool_choice="auto",
+            stream=True
+        )
+        content = []
+        calls = {}
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                self.emit(delta.content)
+            for call_delta in delta.tool_calls or []:
+                call = calls.setdefault(call_delta.index, {"name": "", "arguments": ""})
+                function = call_delta.function
+                if function is None:
+                    continue
+                if function.name:
+                    if not call["name"]:
+                        self.emit(f"\n[Calling {function.name}...]")
+                    call["name"] += function.name
+                if function.arguments:
+                    call["arguments"] += function.arguments
+
+        tool_calls = [
+            SimpleNamespace(function=SimpleNamespace(name=call["name"], arguments=call["arguments"] or "{}"))
+            for _, call in sorted(calls.items())
+        ]
+        return "".join(content), tool_calls
 
+    def process_query(self, query: str) -> str:
+        self.emitted = False
+        self.streamed_content = ""
         try:
-            messages = [{"role": "user", "content": query}]
+            reply = self.answer(query)
+        except Exception as e:
+            reply = f"Error: {str(e)}"
+        # Stream whatever part of the reply the callback has not seen yet
+        if self.callback is not None and reply != self.streamed_content:
+            self.emit(("\n\n" if self.emitted else "") + reply)
+        return reply
+
+    def answer(self, query: str) -> str:
+        messages = [{"role": "user", "content": query}]
+        if self.callback is not None:
+            content, tool_calls = self.stream_completion(messages)
+            self.streamed_content = content
+        else:
             response = self.client.chat.completions.create(
                 model="local-model",  # ignored by LM Studio but required
                 messages=messages,
                 tools=function_definitions,
                 tool_choice="auto"
             )
-            
             message = response.choices[0].message
-            
-            # Check if the model wants to call a function using standard OpenAI format
-            if message.tool_calls:
-                results = []
-                for tool_call in message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # Call the function
-                    if function_name in available_functions:
-                        function_to_call = available_functions[function_name]
-                        function_response = function_to_call(**function_args)
-                        
-                        # Format the result
-                        results.append(f"Result from {function_name}:\n{json.dumps(function_response, indent=2)}")
-                    else:
-                        results.append(f"Error: Function {function_name} not found")
-                
-                return "\n\n".join(results)
-            else:
-                # Alternative: Check for XML-style function calls in the content
-                content = message.content if message.content else ""
-                if "<call>" in content and "</call>" in content:
-                    # Extract function call information from XML format
-                    call_start = content.find("<call>") + len("<call>")
-                    call_end = content.find("</call>")
-                    call_content = content[call_start:call_end].strip()
-                    
-                    try:
-                        # Parse the function call JSON
-                        call_data = json.loads(call_content)
-                        function_name = call_data.get("name")
-                        function_args = call_data.get("arguments", {})
-                        
-                        # Call the function
-                        if function_name in available_functions:
-                            function_to_call = available_functions[function_name]
-                            function_response = function_to_call(**function_args)
-                            
-                            # If the content has text before/after the function call, include it
-                            result = f"I called {function_name} for you. Here are the results:\n\n"
-                            result += json.dumps(function_response, indent=2)
-                            return result
-                        else:
-                            return f"Error: Function {function_name} not found"
-                    except json.JSONDecodeError:
-                        # If JSON parsing fails, return the original content
-                        return content
-                
-                # The model didn't call a function, just return the response
-                return content if content else "No response from assistant"
-                    
-        except Exception as e:
-            return f"Error: {str(e)}"
\ No newline at end of file
+            content, tool_calls = message.content, message.tool_calls
+
+        # Check if the model wants to call a function using standard OpenAI format
+        if tool_calls:
+            on_done = (lambda name: self.emit(f"\n[{name} completed]")) if self.callback is not None else None
+            results = run_tool_calls(tool_calls, self.executor, on_done)
+            return "\n\n".join(results)
+
+        # Alternative: Check for XML-style function calls in the content
+        content = content if content else ""
+        if "<call>" in content and "</call>" in content:
+            # Extract function call information from XML format
+            call_start = content.find("<call>") + len("<call>")
+            call_end = content.find("</call>")
+            call_content = content[call_start:call_end].strip()
+
+            try:
+                # Parse the function call JSON
+                call_data = json.loads(call_content)
+                function_name = call_data.get("name")
+                function_args = call_data.get("arguments", {})
+
+                # Call the function
+                if function_name in available_functions:
+                    function_to_call = available_functions[function_name]
+                    function_response = function_to_call(**function_args)
+
+                    # If the content has text before/after the function call, include it
+                    result = f"I called {function_name} for you. Here are the results:\n\n"
+                    result += json.dumps(function_response, indent=2)
+                    return result
+                else:
+                    return f"Error: Function {function_name} not found"
+            except json.JSONDecodeError:
+                # If JSON parsing fails, return the original content
+                return content
+
+        # The model didn't call a function, just return the response
+        return content if content else "No response from assistant"
@@ -0,0 +1,137 @@
+import os
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import formats
+
+try:
+    import brotli
+except ImportError:  # urllib3 can only decode brotli when it is installed
+    brotli = None
+
+API_URL = os.environ.get("API_URL", "http://127.0.0.1:8000")
+
+# Methods that are safe to send again after a connection error or a 502/503/504
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class ApiClient:
+    """HTTP client for the API shared by the CLI, the GUIs and the agent.
+
+    One requests.Session keeps a pool of keep-alive connections, every call
+    gets a timeout, and idempotent calls are retried with exponential backoff.
+    Defaults come from the API_URL, API_TIMEOUT, API_RETRIES, API_BACKOFF,
+    API_POOL_SIZE, API_GZIP and API_COMPACT environment variables.
+
+    With `compact` (the default), list pages are requested column by column,
+    as MessagePack when it is installed, and decoded back to rows.
+    """
+
+    def __init__(self, base_url=None, timeout=None, retries=None, backoff=None, pool_size=None, gzip=None, compact=None):
+        self.base_url = (base_url or API_URL).rstrip("/")
+        self.timeout = timeout if timeout is not None else float(os.environ.get("API_TIMEOUT", 10))
+        retries = retries if retries is not None else int(os.environ.get("API_RETRIES", 3))
+        backoff = backoff if backoff is not None else float(os.environ.get("API_BACKOFF", 0.2))
+        pool_size = pool_size if pool_size is not None else int(os.environ.get("API_POOL_SIZE", 10))
+        gzip = gzip if gzip is not None else os.environ.get("API_GZIP", "1") == "1"
+        compact = compact if compact is not None else os.environ.get("API_COMPACT", "1") == "1"
+        # Accept header of list requests; plain JSON stays acceptable for older servers
+        self.page_accept = ", ".join(formats.compact_formats() + [formats.JSON + ";q=0.5"]) if compact else formats.JSON
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if not gzip:
+            self.session.headers["Accept-Encoding"] = "identity"
+        else:
+            self.session.headers["Accept-Encoding"] = "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.base_url + path, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def get_page(self, path, params=None, headers=None, columns=False):
+        """GET a list endpoint in the compact format; returns (decoded page, response)"""
+        headers = {"Accept": self.page_accept, **(headers or {})}
+        response = self.get(path, params=params, headers=headers)
+        content_type = response.headers.get("Content-Type", "")
+        # Nothing to decode for 304s and non-JSON error pages; callers check the response
+        if response.status_code == 304 or (not response.ok and "json" not in content_type):
+            return None, response
+        return formats.decode_page(response.content, content_type, columns), response
+
+    # /items helpers returning the decoded JSON body
+    def list_items(self, limit: Optional[int] = None, after: Optional[str] = None, columns=False, **filters):
+        """A page of records; with `columns`, the page is {"columns": {name: values}, "next_cursor"}.
+
+        `filters` are the GET /items query parameters: nome, q, idade_min,
+        idade_max, sort and fields.
+        """
+        params = {name: value for name, value in filters.items() if value is not None}
+        if limit is not None:
+            params["limit"] = limit
+        if after is not None:
+            params["after"] = after
+        return self.get_page("/items", params=params, columns=columns)[0]
+
+    def iter_items(self, page_size=1000, **filters):
+        """Yield every matching record, following the pagination cursor"""
+        after = None
+        while True:
+            page = self.list_items(limit=page_size, after=after, **filters)
+            yield from page["items"]
+            after = page["next_cursor"]
+            if after is None:
+                return
+
+    def get_stats(self, bucket: Optional[int] = None):
+        params = {"bucket": bucket} if bucket is not None else {}
+        return self.get("/items/stats", params=params).json()
+
+    def get_item(self, item_id: int):
+        return self.get(f"/items/{item_id}").json()
+
+    def create_item(self, nome: str, idade: int):
+        return self.post("/items", json={"nome": nome, "idade": idade}).json()
+
+    def update_item(self, item_id: int, nome: Optional[str] = None, idade: Optional[int] = None):
+        data = {}
+        if nome is not None:
+            data["nome"] = nome
+        if idade is not None:
+            data["idade"] = idade
+        return self.patch(f"/items/{item_id}", json=data).json()
+
+    def delete_item(self, item_id: int):
+        return self.delete(f"/items/{item_id}").json()
+
+    def close(self):
+        self.session.close()
+
+
+# Shared instance, so every caller in a process reuses the same connection pool
+client = ApiClient()
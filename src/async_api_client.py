@@ -0,0 +1,191 @@
+import asyncio
+import os
+from typing import Optional
+import httpx
+import formats
+from api_client import API_URL
+
+
+class AsyncApiClient:
+    """asyncio client for the /items API, meant for scripts that drive heavy traffic.
+
+    - At most `concurrency` requests are in flight at once. Callers can
+      asyncio.gather() any number of calls and the semaphore schedules them.
+    - create_item() calls are collected for up to `batch_delay` seconds, or
+      until `batch_size` are waiting, and sent as one POST /items/bulk. If the
+      server has no bulk endpoint, or rejects a batch, the items are sent one
+      by one instead.
+    - iter_items() streams every record and prefetches the next page while
+      the current one is consumed.
+    - With `compact` (API_COMPACT, on by default), pages are requested column
+      by column, as MessagePack when it is installed, and decoded back to rows.
+
+    Use it as an async context manager so pending creates are flushed:
+
+        async with AsyncApiClient() as api:
+            await asyncio.gather(*(api.create_item(f"Pessoa {i}", 30) for i in range(10000)))
+    """
+
+    def __init__(self, base_url=None, concurrency=None, timeout=None, batch_size=500, batch_delay=0.005, compact=None):
+        self.concurrency = concurrency if concurrency is not None else int(os.environ.get("API_CONCURRENCY", 32))
+        timeout = timeout if timeout is not None else float(os.environ.get("API_TIMEOUT", 10))
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        compact = compact if compact is not None else os.environ.get("API_COMPACT", "1") == "1"
+        self.page_accept = ", ".join(formats.compact_formats() + [formats.JSON + ";q=0.5"]) if compact else formats.JSON
+        self._http = httpx.AsyncClient(
+            base_url=(base_url or API_URL).rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._pending = []  # ((nome, idade), future) waiting for the next batch
+        self._flush_handle = None
+        self._batches = set()
+        # None until the first batch tells us whether POST /items/bulk exists
+        self.bulk_supported = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, method, path, **kwargs):
+        async with self._semaphore:
+            response = await self._http.request(method, path, **kwargs)
+        response.raise_for_status()
+        return formats.decode_page(response.content, response.headers.get("Content-Type"))
+
+    async def list_items(self, limit: Optional[int] = None, after: Optional[str] = None, **filters):
+        """A page of records; `filters` are the GET /items query parameters (nome, q, idade_min, ...)"""
+        params = {name: value for name, value in filters.items() if value is not None}
+        if limit is not None:
+            params["limit"] = limit
+        if after is not None:
+            params["after"] = after
+        return await self.request("GET", "/items", params=params, headers={"Accept": self.page_accept})
+
+    async def iter_items(self, page_size=1000, **filters):
+        """Yield every matching record, fetching the next page while the current one is consumed"""
+        page = await self.list_items(limit=page_size, **filters)
+        while True:
+            next_page = None
+            if page["next_cursor"] is not None:
+                next_page = asyncio.ensure_future(
+                    self.list_items(limit=page_size, after=page["next_cursor"], **filters)
+                )
+            try:
+                for item in page["items"]:
+                    yield item
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+            if next_page is None:
+                return
+            page = await next_page
+
+    async def get_stats(self, bucket: Optional[int] = None):
+        params = {"bucket": bucket} if bucket is not None else {}
+        return await self.request("GET", "/items/stats", params=params)
+
+    async def get_item(self, item_id: int):
+        return await self.request("GET", f"/items/{item_id}")
+
+    async def create_item(self, nome: str, idade: int):
+        """Create a record and return it; batched with concurrent creates"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(((nome, idade), future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_delay, self._flush)
+        return await future
+
+    async def update_item(self, item_id: int, nome: Optional[str] = None, idade: Optional[int] = None):
+        data = {}
+        if nome is not None:
+            data["nome"] = nome
+        if idade is not None:
+            data["idade"] = idade
+        return await self.request("PATCH", f"/items/{item_id}", json=data)
+
+    async def delete_item(self, item_id: int):
+        return await self.request("DELETE", f"/items/{item_id}")
+
+    # Bulk helpers, one request per `chunk_size` records
+    async def create_many(self, items, chunk_size=1000):
+        """Create (nome, idade) pairs and return their ids in order"""
+        items = list(items)
+        chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+        results = await asyncio.gather(*(
+            self.request("POST", "/items/bulk", json=[{"nome": nome, "idade": idade} for nome, idade in chunk])
+            for chunk in chunks
+        ))
+        return [id for result in results for id in result["ids"]]
+
+    async def update_many(self, changes, chunk_size=1000):
+        """Apply {"id", "nome"?, "idade"?} changes and return the per-id outcomes"""
+        changes = list(changes)
+        results = await asyncio.gather(*(
+            self.request("PATCH", "/items/bulk", json=changes[start:start + chunk_size])
+            for start in range(0, len(changes), chunk_size)
+        ))
+        return [outcome for result in results for outcome in result["results"]]
+
+    async def delete_many(self, ids, chunk_size=1000):
+        """Delete ids and return the per-id outcomes"""
+        ids = list(ids)
+        results = await asyncio.gather(*(
+            self.request("DELETE", "/items/bulk", json=ids[start:start + chunk_size])
+            for start in range(0, len(ids), chunk_size)
+        ))
+        return [outcome for result in results for outcome in result["results"]]
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, batch):
+        try:
+            if self.bulk_supported is not False:
+                async with self._semaphore:
+                    response = await self._http.post(
+                        "/items/bulk", json=[{"nome": nome, "idade": idade} for (nome, idade), _ in batch]
+                    )
+                if response.status_code in (404, 405):
+                    self.bulk_supported = False
+                elif response.status_code != 422:
+                    response.raise_for_status()
+                    self.bulk_supported = True
+                    for ((nome, idade), future), id in zip(batch, response.json()["ids"]):
+                        if not future.done():
+                            future.set_result({"id": id, "nome": nome, "idade": idade})
+                    return
+            # No bulk endpoint, or one invalid record failed the whole batch: send them one by one
+            await asyncio.gather(*(self._send_one(record, future) for record, future in batch))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _send_one(self, record, future):
+        nome, idade = record
+        try:
+            result = await self.request("POST", "/items", json={"nome": nome, "idade": idade})
+            future.set_result(result["item"])
+        except Exception as e:
+            future.set_exception(e)
+
+    async def close(self):
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self._http.aclose()
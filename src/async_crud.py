@@ -0,0 +1,226 @@
+import os
+import time
+from starlette.concurrency import run_in_threadpool
+from crud import Database, EVENTS_CHANNEL, event_payloads, search_query, stats_queries, stats_result  # also loads db.env
+from metrics import observe_query
+from profiling import track_thread
+
+try:
+    import asyncpg
+except ImportError:  # only needed for DB_ENGINE=async
+    asyncpg = None
+
+
+class AsyncDatabase:
+    """asyncpg-backed mirror of crud.Database for use from async routes"""
+
+    def __init__(self, min_size=None, max_size=None):
+        self.min_size = min_size if min_size is not None else int(os.environ.get("DB_POOL_MIN", 1))
+        self.max_size = max_size if max_size is not None else int(os.environ.get("DB_POOL_MAX", 10))
+        self.pool = None
+
+    async def connect(self):
+        if asyncpg is None:
+            raise RuntimeError("DB_ENGINE=async requires the asyncpg package")
+        self.pool = await asyncpg.create_pool(
+            database=os.environ["DB_NAME"],
+            user=os.environ["DB_USER"],
+            password=os.environ["DB_PASSWORD"],
+            host=os.environ["DB_HOST"],
+            port=int(os.environ["DB_PORT"]),
+            min_size=self.min_size,
+            max_size=self.max_size,
+        )
+
+    async def query(self, statement, call, sql, *args):
+        """Run call(sql, *args), e.g. conn.fetch, and report it to metrics under `statement`"""
+        start = time.perf_counter()
+        result = await call(sql, *args)
+        if isinstance(result, list):
+            rows = len(result)
+        elif isinstance(result, str):  # execute() status such as "SELECT 1"
+            rows = int(result.rsplit(" ", 1)[-1]) if result[-1:].isdigit() else None
+        else:
+            rows = int(result is not None)
+        observe_query(statement, time.perf_counter() - start, rows, sql, args)
+        return result
+
+    async def select_all(self):
+        rows = await self.query("select_all", self.pool.fetch, "SELECT * FROM minha_tabela")
+        return [dict(row) for row in rows]
+
+    async def select_page(self, limit, after=None):
+        """Get up to `limit` records with id greater than `after`, ordered by id"""
+        if after is None:
+            rows = await self.query("select_first_page", self.pool.fetch, "SELECT * FROM minha_tabela ORDER BY id LIMIT $1", limit)
+        else:
+            rows = await self.query("select_page", self.pool.fetch, "SELECT * FROM minha_tabela WHERE id > $1::bigint ORDER BY id LIMIT $2", after, limit)
+        return [dict(row) for row in rows]
+
+    async def search(self, limit, after=None, **filters):
+        """Get up to `limit` records matching the filters of search_query(), in its sort order"""
+        sql, params = search_query(limit, after, placeholder="$", **filters)
+        rows = await self.query("search", self.pool.fetch, sql, *params)
+        return [dict(row) for row in rows]
+
+    async def select_by_id(self, id):
+        """Get a single record by ID"""
+        row = await self.query("select_by_id", self.pool.fetchrow, "SELECT * FROM minha_tabela WHERE id = $1::bigint", id)
+        return dict(row) if row is not None else None
+
+    async def insert_data(self, nome, idade):
+        """Insert a record and return it, including the generated id"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await self.query("insert_data", conn.fetchrow, "INSERT INTO minha_tabela (nome, idade) VALUES ($1, $2) RETURNING *", nome, idade)
+                row = dict(row)
+                await self.notify(conn, "insert", row=row)
+        return row
+
+    async def insert_many(self, rows, page_size=1000):
+        """Insert (nome, idade) pairs in one transaction and return the new ids in input order"""
+        ids = []
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for start in range(0, len(rows), page_size):
+                    chunk = rows[start:start + page_size]
+                    result = await self.query(
+                        "insert_many", conn.fetch,
+                        "INSERT INTO minha_tabela (nome, idade) "
+                        "SELECT * FROM unnest($1::text[], $2::int[]) RETURNING id",
+                        [nome for nome, _ in chunk],
+                        [idade for _, idade in chunk],
+                    )
+                    ids.extend(row["id"] for row in result)
+                await self.notify(conn, "insert", ids)
+        return ids
+
+    async def update_data(self, id, nome=None, idade=None):
+        """Update a record in one statement and return it, or None if it does not exist.
+
+        A None nome or idade keeps the current value.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await self.query(
+                    "update_data", conn.fetchrow,
+                    "UPDATE minha_tabela SET nome = COALESCE($1, nome), idade = COALESCE($2, idade) "
+                    "WHERE id = $3::bigint RETURNING *",
+                    nome, idade, id,
+                )
+                if row is None:
+                    return None
+                row = dict(row)
+                await self.notify(conn, "update", row=row)
+        return row
+
+    async def update_many(self, changes):
+        """Apply (id, nome, idade) changes in one statement and return the ids that were updated.
+
+        A None nome or idade keeps the current value.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await self.query(
+                    "update_many", conn.fetch,
+                    "UPDATE minha_tabela AS t "
+                    "SET nome = COALESCE(v.nome, t.nome), idade = COALESCE(v.idade, t.idade) "
+                    "FROM unnest($1::bigint[], $2::text[], $3::int[]) AS v(id, nome, idade) "
+                    "WHERE t.id = v.id RETURNING t.id",
+                    [id for id, _, _ in changes],
+                    [nome for _, nome, _ in changes],
+                    [idade for _, _, idade in changes],
+                )
+                updated = [row["id"] for row in rows]
+                await self.notify(conn, "update", updated)
+        return updated
+
+    async def delete_data(self, id):
+        """Delete a record and return whether it existed"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                deleted = await self.query("delete_data", conn.fetchval, "DELETE FROM minha_tabela WHERE id = $1::bigint RETURNING id", id) is not None
+                if deleted:
+                    await self.notify(conn, "delete", [id])
+        return deleted
+
+    async def delete_many(self, ids):
+        """Delete all given ids in one statement and return the ids that existed"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await self.query("delete_many", conn.fetch, "DELETE FROM minha_tabela WHERE id = ANY($1::bigint[]) RETURNING id", list(ids))
+                deleted = [row["id"] for row in rows]
+                await self.notify(conn, "delete", deleted)
+        return deleted
+
+    async def notify(self, conn, op, ids=(), row=None):
+        """Queue change events; Postgres only delivers them if the transaction commits"""
+        for payload in event_payloads(op, ids, row):
+            await self.query("notify", conn.execute, "SELECT pg_notify($1, $2)", EVENTS_CHANNEL, payload)
+
+    async def stats(self, bucket=10, source="summary"):
+        """Count, min/max/avg idade and an idade histogram; see stats_queries()"""
+        totals, histogram, params = stats_queries(bucket, source, placeholder="$")
+        async with self.pool.acquire() as conn:
+            totals = await self.query("stats_totals", conn.fetchrow, totals)
+            rows = await self.query("stats_histogram", conn.fetch, histogram, *params)
+        return stats_result(dict(totals), [dict(row) for row in rows], bucket)
+
+    async def table_version(self):
+        """Counter bumped by a trigger on every write statement to minha_tabela"""
+        return await self.query(
+            "table_version", self.pool.fetchval,
+            "SELECT version FROM table_version WHERE table_name = 'minha_tabela'",
+        )
+
+    async def pool_stats(self):
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "in_use": self.pool.get_size() - self.pool.get_idle_size(),
+            "minconn": self.pool.get_min_size(),
+            "maxconn": self.pool.get_max_size(),
+        }
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+
+class ThreadedDatabase:
+    """Async facade over the sync Database.
+
+    Every method of the wrapped Database is exposed as a coroutine that runs
+    in FastAPI's threadpool, so routes can await either engine the same way.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(track_thread, method, *args, **kwargs)
+
+        return call
+
+
+def create_engine(db: Database, kind=None):
+    """Select the engine used by the /items routes: "sync" (default) or "async"
+
+    Controlled by the DB_ENGINE environment variable so both engines can be
+    benchmarked against the same code paths.
+    """
+    kind = kind or os.environ.get("DB_ENGINE", "sync")
+    if kind == "async":
+        return AsyncDatabase()
+    if kind == "sync":
+        return ThreadedDatabase(db)
+    raise ValueError("Unknown DB_ENGINE: %r (expected 'sync' or 'async')" % kind)
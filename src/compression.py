@@ -0,0 +1,129 @@
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered
+    brotli = None
+
+# Streams that must reach the client as they are written
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def accepted_encoding(accept_encoding):
+    """Best supported coding in an Accept-Encoding header: "br", "gzip" or None"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        key, _, value = params.strip().partition("=")
+        if key == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda coding: weights.get(coding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class Compressor:
+    """Incremental brotli or gzip encoder"""
+
+    def __init__(self, coding, gzip_level=6, brotli_quality=4):
+        self.coding = coding
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        """Compress a chunk; `flush` makes everything written so far decodable by the client"""
+        if self.coding == "br":
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        return self._gzip.compress(data) + (self._gzip.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self, data=b""):
+        if self.coding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._gzip.compress(data) + self._gzip.flush()
+
+
+class CompressionMiddleware:
+    """Compress responses of at least `minimum_size` bytes with brotli or gzip.
+
+    Brotli is preferred when the `brotli` package is installed and the client
+    accepts it. Streaming responses are compressed chunk by chunk and each
+    chunk is flushed, so exports still arrive progressively. Server-Sent
+    Events and responses that already have a Content-Encoding pass through.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressingSender(send, coding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressingSender:
+    """ASGI send wrapper that decides on the first body chunk whether to compress"""
+
+    def __init__(self, send, coding, middleware):
+        self._send = send
+        self.coding = coding
+        self.middleware = middleware
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if ("content-encoding" in headers or content_type.startswith(UNCOMPRESSED_TYPES)
+                    or (not more_body and len(body) < self.middleware.minimum_size)):
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            self.compressor = Compressor(self.coding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            headers["Content-Encoding"] = self.coding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                body = self.compressor.compress(body, flush=True)
+            else:
+                body = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+        body = self.compressor.compress(body, flush=True) if more_body else self.compressor.finish(body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -1,47 +1,644 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
+from contextlib import contextmanager
+from collections import deque
+import threading
+import time
+import json
+import base64
 import os
 from pathlib import Path
+from metrics import observe_query
+from profiling import db_call
 
 # Configuração direta do banco PostgreSQL
 
 env_path = Path(__file__).parent.parent / "db.env"
 load_dotenv(env_path)
 
-class Database:
+# Columns of minha_tabela, in table order
+COLUMNS = ("id", "nome", "idade")
+
+# Page size of list queries when the caller does not ask for one, and the hard cap
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Accepted `sort` values of search(); a "-" prefix means descending
+SORT_KEYS = ("id", "-id", "nome", "-nome", "idade", "-idade")
+
+# NOTIFY channel of the change feed (see events.py)
+EVENTS_CHANNEL = "minha_tabela_events"
+# ids per NOTIFY payload, keeping bulk events well under Postgres' 8000-byte limit
+EVENT_IDS_PER_PAYLOAD = 500
+
+
+def connect_kwargs():
+    """psycopg2.connect() arguments read from db.env"""
+    return dict(
+        dbname=os.environ["DB_NAME"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        host=os.environ["DB_HOST"],
+        port=os.environ["DB_PORT"],
+    )
+
+
+def event_payloads(op, ids, row=None):
+    """NOTIFY payloads describing one write: "insert", "update" or "delete".
+
+    Single-row inserts and updates carry the new row; bulk writes only carry
+    the ids, split over as many payloads as needed.
+    """
+    if row is not None:
+        return [json.dumps({"op": op, "ids": [row["id"]], "row": dict(row)})]
+    ids = list(ids)
+    return [
+        json.dumps({"op": op, "ids": ids[start:start + EVENT_IDS_PER_PAYLOAD]})
+        for start in range(0, len(ids), EVENT_IDS_PER_PAYLOAD)
+    ]
+
+
+def escape_like(text):
+    """Escape LIKE wildcards so user input only matches literally"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def page_cursor(row, sort="id"):
+    """Opaque cursor pointing after `row` in `sort` order.
+
+    Sorting by id keeps the plain id cursor of select_page; other sorts
+    encode the sort key, its value and the id as URL-safe base64 JSON.
+    """
+    column = sort.lstrip("-")
+    if column == "id":
+        return str(row["id"])
+    raw = json.dumps([sort, row[column], row["id"]], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def parse_cursor(cursor, sort="id"):
+    """Inverse of page_cursor: the last id, or (sort value, id); ValueError if it does not fit `sort`"""
+    column = sort.lstrip("-")
+    if column == "id":
+        return int(cursor)
+    try:
+        key, value, id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+    expected = str if column == "nome" else int
+    if key != sort or not isinstance(value, expected) or not isinstance(id, int):
+        raise ValueError("cursor does not match sort")
+    return value, id
+
+
+# Widest histogram bucket: stats_queries() binds it as a Postgres int
+MAX_STATS_BUCKET = 2**31 - 1
+
+# Per-idade row counts behind stats(): the summary kept up to date by the
+# 0004_item_stats triggers, or the same counts computed from the table
+STATS_SOURCES = {
+    "summary": "minha_tabela_idade_counts",
+    "table": "(SELECT idade, count(*) AS count FROM minha_tabela GROUP BY idade) AS counts",
+}
+
+
+def stats_queries(bucket, source="summary", placeholder="%s"):
+    """SQL of the totals and of the histogram with `bucket`-wide idade ranges.
+
+    Both read per-idade counts, so with the summary their cost depends on
+    the number of distinct ages rather than on the number of rows.
+    """
+    counts = STATS_SOURCES[source]
+    totals = (
+        "SELECT COALESCE(sum(count), 0)::bigint AS count, min(idade) AS idade_min, max(idade) AS idade_max, "
+        "sum(idade::numeric * count) / NULLIF(sum(count), 0) AS idade_avg FROM " + counts
+    )
+    width = placeholder if placeholder == "%s" else "$1"
+    histogram = (
+        "SELECT floor(idade::numeric / %s::int)::int * %s::int AS bucket, sum(count)::bigint AS count FROM %s "
+        "GROUP BY 1 ORDER BY 1" % (width, width, counts)
+    )
+    return totals, histogram, ([bucket, bucket] if placeholder == "%s" else [bucket])
+
+
+def stats_result(totals, histogram, bucket):
+    """Shape the rows of stats_queries() as the GET /items/stats body"""
+    avg = totals["idade_avg"]
+    return {
+        "count": totals["count"],
+        "idade_min": totals["idade_min"],
+        "idade_max": totals["idade_max"],
+        "idade_avg": round(float(avg), 2) if avg is not None else None,
+        "histogram": [
+            {"idade_min": row["bucket"], "idade_max": row["bucket"] + bucket - 1, "count": row["count"]}
+            for row in histogram
+        ],
+    }
+
+
+def search_query(limit, after=None, nome=None, q=None, idade_min=None, idade_max=None,
+                 sort="id", fields=COLUMNS, placeholder="%s"):
+    """Compile a filtered, sorted, projected page query into (sql, params).
+
+    - nome: case-insensitive name prefix (btree index on lower(nome))
+    - q: case-insensitive substring of the name (pg_trgm GIN index)
+    - idade_min / idade_max: inclusive age range
+    - sort: one of SORT_KEYS, paged by keyset on (sort column, id)
+    - after: parse_cursor() of the previous page's cursor
+
+    `placeholder` is "%s" for psycopg2 or "$" for numbered asyncpg parameters.
+    The id and the sort column are always selected so the next cursor can be
+    built; callers drop them if they were not asked for.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError("invalid sort: %r" % sort)
+    column = sort.lstrip("-")
+    descending = sort.startswith("-")
+    params = []
+
+    def param(value):
+        params.append(value)
+        return placeholder if placeholder == "%s" else "$%d" % len(params)
+
+    where = []
+    if nome:
+        where.append("lower(nome) LIKE %s" % param(escape_like(nome.lower()) + "%"))
+    if q:
+        where.append("nome ILIKE %s" % param("%" + escape_like(q) + "%"))
+    if idade_min is not None:
+        where.append("idade >= %s" % param(idade_min))
+    if idade_max is not None:
+        where.append("idade <= %s" % param(idade_max))
+    if after is not None:
+        op = "<" if descending else ">"
+        if column == "id":
+            where.append("id %s %s::bigint" % (op, param(after)))
+        else:
+            value, id = after
+            where.append("(%s, id) %s (%s, %s::bigint)" % (column, op, param(value), param(id)))
+
+    selected = [name for name in COLUMNS if name in fields or name in ("id", column)]
+    direction = " DESC" if descending else ""
+    order = ["id" + direction] if column == "id" else [column + direction, "id" + direction]
+    sql = "SELECT %s FROM minha_tabela" % ", ".join(selected)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY %s LIMIT %s" % (", ".join(order), param(limit))
+    return sql, params
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection carrying the bookkeeping the pool needs"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Names of the statements PREPAREd on this session
+        self.prepared = set()
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are handed out one per request and returned afterwards.
+    Idle connections that have not been used for `check_interval` seconds
+    are pinged before being handed out, and broken ones are replaced.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30.0, check_interval=30.0, on_connect=None, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: minconn=%s, maxconn=%s" % (minconn, maxconn))
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.on_connect = on_connect
+        self._connect_kwargs = connect_kwargs
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "discarded": 0,
+        }
+        for _ in range(minconn):
+            self._size += 1
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self._connect_kwargs)
+        if self.on_connect is not None:
+            try:
+                self.on_connect(conn)
+                conn.commit()
+            except Exception:
+                self._close_quietly(conn)
+                raise
+        return conn
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to `timeout` seconds for a free slot"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout("No connection available after %.1fs" % timeout)
+                self._cond.wait(remaining)
+            waited = time.monotonic() - start
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            if waited > 0.001:
+                self._stats["waits"] += 1
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            self._in_use += 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn):
+                self._close_quietly(conn)
+                conn = self._connect()
+                with self._cond:
+                    self._stats["reconnects"] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it is broken or `discard` is set"""
+        if not discard and not conn.closed:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                self._stats["discarded"] += 1
+                self._close_quietly(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for one unit of work.
+
+        Commits on success and rolls back on error. Connections that fail with
+        an OperationalError or InterfaceError are dropped instead of reused.
+        """
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def stats(self):
+        """Snapshot of pool size and checkout wait-time statistics"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._in_use,
+                minconn=self.minconn,
+                maxconn=self.maxconn,
+            )
+        checkouts = stats["checkouts"]
+        stats["wait_time_avg"] = stats["wait_time_total"] / checkouts if checkouts else 0.0
+        return stats
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._close_quietly(self._idle.pop())
+                self._size -= 1
+            self._cond.notify_all()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PreparedStatements:
+    """Registry of named server-side prepared statements.
+
+    Every registered statement is PREPAREd once on each new pooled
+    connection (so a reconnect re-prepares them transparently) and then
+    run with EXECUTE, sparing Postgres the parse and plan on each call.
+    Call counts and timings are kept per statement.
+    """
+
     def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=os.environ["DB_NAME"], 
-            user=os.environ["DB_USER"],   
-            password=os.environ["DB_PASSWORD"], 
-            host=os.environ["DB_HOST"],   
-            port=os.environ["DB_PORT"],    
-            cursor_factory=RealDictCursor
+        self._statements = {}  # name -> (PREPARE sql, EXECUTE sql)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, types, sql):
+        """Register `sql`, written with $1..$n placeholders of the given Postgres types"""
+        prepare = "PREPARE %s" % name
+        execute = "EXECUTE %s" % name
+        if types:
+            prepare += " (%s)" % ", ".join(types)
+            # Explicit casts, so that e.g. a list of None still binds as int[]
+            execute += " (%s)" % ", ".join("%%s::%s" % type for type in types)
+        self._statements[name] = ("%s AS %s" % (prepare, sql), execute)
+        self._stats[name] = {"calls": 0, "time_total": 0.0, "time_max": 0.0}
+
+    def prepare(self, cur, name):
+        cur.execute(self._statements[name][0])
+        cur.connection.prepared.add(name)
+
+    def prepare_all(self, conn):
+        """Pool on_connect hook: prepare every registered statement on a new connection"""
+        with conn.cursor() as cur:
+            for name in self._statements:
+                self.prepare(cur, name)
+
+    def execute(self, cur, name, params=()):
+        start = time.perf_counter()
+        if name not in cur.connection.prepared:
+            self.prepare(cur, name)
+        with db_call():
+            cur.execute(self._statements[name][1], params)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["time_total"] += elapsed
+            stats["time_max"] = max(stats["time_max"], elapsed)
+        observe_query(name, elapsed, cur.rowcount, self._statements[name][1], params)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(stats, time_avg=stats["time_total"] / stats["calls"] if stats["calls"] else 0.0)
+                for name, stats in self._stats.items()
+            }
+
+
+def register_statements(statements):
+    """Statements run by Database through the prepared statement registry.
+
+    Ids are bound as bigint so that out-of-range ids from clients match no
+    row instead of failing the cast; int4 = int8 still uses the primary key.
+    """
+    statements.register("select_first_page", ["int"], "SELECT * FROM minha_tabela ORDER BY id LIMIT $1")
+    statements.register("select_page", ["bigint", "int"], "SELECT * FROM minha_tabela WHERE id > $1 ORDER BY id LIMIT $2")
+    statements.register("select_by_id", ["bigint"], "SELECT * FROM minha_tabela WHERE id = $1")
+    statements.register(
+        "insert_data", ["text", "int"],
+        "INSERT INTO minha_tabela (nome, idade) VALUES ($1, $2) RETURNING *",
+    )
+    statements.register(
+        "update_data", ["text", "int", "bigint"],
+        "UPDATE minha_tabela SET nome = COALESCE($1, nome), idade = COALESCE($2, idade) "
+        "WHERE id = $3 RETURNING *",
+    )
+    statements.register(
+        "update_many", ["bigint[]", "text[]", "int[]"],
+        "UPDATE minha_tabela AS t "
+        "SET nome = COALESCE(v.nome, t.nome), idade = COALESCE(v.idade, t.idade) "
+        "FROM unnest($1, $2, $3) AS v(id, nome, idade) "
+        "WHERE t.id = v.id RETURNING t.id",
+    )
+    statements.register("delete_data", ["bigint"], "DELETE FROM minha_tabela WHERE id = $1 RETURNING id")
+    statements.register("delete_many", ["bigint[]"], "DELETE FROM minha_tabela WHERE id = ANY($1) RETURNING id")
+    statements.register(
+        "table_version", [],
+        "SELECT version FROM table_version WHERE table_name = 'minha_tabela'",
+    )
+    statements.register("notify", ["text", "text"], "SELECT pg_notify($1, $2)")
+
+
+def execute_observed(cur, statement, sql, params=None):
+    """cur.execute() for statements outside the prepared registry, reported to metrics under `statement`"""
+    start = time.perf_counter()
+    with db_call():
+        cur.execute(sql, params)
+    observe_query(statement, time.perf_counter() - start, cur.rowcount, sql, params)
+
+
+class Database:
+    def __init__(self, minconn=None, maxconn=None):
+        self.statements = PreparedStatements()
+        register_statements(self.statements)
+        self.pool = ConnectionPool(
+            minconn=minconn if minconn is not None else int(os.environ.get("DB_POOL_MIN", 1)),
+            maxconn=maxconn if maxconn is not None else int(os.environ.get("DB_POOL_MAX", 10)),
+            timeout=float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+            check_interval=float(os.environ.get("DB_POOL_CHECK_INTERVAL", 30)),
+            on_connect=self.statements.prepare_all,
+            cursor_factory=RealDictCursor,
+            **connect_kwargs()
         )
-        self.cur = self.conn.cursor()
+
+    @contextmanager
+    def cursor(self):
+        """Cursor on a pooled connection, committed when the block exits"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
 
     def select_all(self):
-        self.cur.execute("SELECT * FROM minha_tabela")
-        return self.cur.fetchall()
+        with self.cursor() as cur:
+            execute_observed(cur, "select_all", "SELECT * FROM minha_tabela")
+            return cur.fetchall()
+
+    def select_page(self, limit, after=None):
+        """Get up to `limit` records with id greater than `after`, ordered by id"""
+        with self.cursor() as cur:
+            if after is None:
+                self.statements.execute(cur, "select_first_page", (limit,))
+            else:
+                self.statements.execute(cur, "select_page", (after, limit))
+            return cur.fetchall()
+
+    def search(self, limit, after=None, **filters):
+        """Get up to `limit` records matching the filters of search_query(), in its sort order"""
+        sql, params = search_query(limit, after, **filters)
+        with self.cursor() as cur:
+            execute_observed(cur, "search", sql, params)
+            return cur.fetchall()
+
+    def iter_rows(self, batch_size=1000):
+        """Yield every record in id order, in lists of up to `batch_size` rows.
+
+        Uses a named (server-side) cursor, so only one batch is held in memory
+        and the connection stays checked out until the generator is exhausted
+        or closed.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor(name="minha_tabela_export") as cur:
+                cur.itersize = batch_size
+                # Only the DECLARE is timed here; each batch is fetched as the caller consumes
+                execute_observed(cur, "iter_rows", "SELECT id, nome, idade FROM minha_tabela ORDER BY id")
+                while True:
+                    with db_call():
+                        rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
 
     def select_by_id(self, id):
         """Get a single record by ID"""
-        self.cur.execute("SELECT * FROM minha_tabela WHERE id = %s", (id,))
-        return self.cur.fetchone()
+        with self.cursor() as cur:
+            self.statements.execute(cur, "select_by_id", (id,))
+            return cur.fetchone()
 
     def insert_data(self, nome, idade):
-        self.cur.execute("INSERT INTO minha_tabela (nome, idade) VALUES (%s, %s)", (nome, idade))
-        self.conn.commit()
+        """Insert a record and return it, including the generated id"""
+        with self.cursor() as cur:
+            self.statements.execute(cur, "insert_data", (nome, idade))
+            row = cur.fetchone()
+            self.notify(cur, "insert", row=row)
+            return row
 
-    def update_data(self, id, nome, idade):
-        self.cur.execute("UPDATE minha_tabela SET nome = %s, idade = %s WHERE id = %s", (nome, idade, id))
-        self.conn.commit()
+    def insert_many(self, rows, page_size=1000):
+        """Insert (nome, idade) pairs in one transaction and return the new ids in input order"""
+        with self.cursor() as cur:
+            sql = "INSERT INTO minha_tabela (nome, idade) VALUES %s RETURNING id"
+            start = time.perf_counter()
+            with db_call():
+                result = execute_values(cur, sql, rows, page_size=page_size, fetch=True)
+            observe_query("insert_many", time.perf_counter() - start, len(result), sql, [rows])
+            ids = [row["id"] for row in result]
+            self.notify(cur, "insert", ids)
+        return ids
+
+    def update_data(self, id, nome=None, idade=None):
+        """Update a record in one statement and return it, or None if it does not exist.
+
+        A None nome or idade keeps the current value.
+        """
+        with self.cursor() as cur:
+            self.statements.execute(cur, "update_data", (nome, idade, id))
+            row = cur.fetchone()
+            if row is not None:
+                self.notify(cur, "update", row=row)
+            return row
+
+    def update_many(self, changes):
+        """Apply (id, nome, idade) changes in one statement and return the ids that were updated.
+
+        A None nome or idade keeps the current value.
+        """
+        with self.cursor() as cur:
+            self.statements.execute(
+                cur,
+                "update_many",
+                (
+                    [id for id, _, _ in changes],
+                    [nome for _, nome, _ in changes],
+                    [idade for _, _, idade in changes],
+                ),
+            )
+            updated = [row["id"] for row in cur.fetchall()]
+            self.notify(cur, "update", updated)
+            return updated
 
     def delete_data(self, id):
-        self.cur.execute("DELETE FROM minha_tabela WHERE id = %s", (id,))
-        self.conn.commit()
+        """Delete a record and return whether it existed"""
+        with self.cursor() as cur:
+            self.statements.execute(cur, "delete_data", (id,))
+            deleted = cur.fetchone() is not None
+            if deleted:
+                self.notify(cur, "delete", [id])
+            return deleted
+
+    def delete_many(self, ids):
+        """Delete all given ids in one statement and return the ids that existed"""
+        with self.cursor() as cur:
+            self.statements.execute(cur, "delete_many", (list(ids),))
+            deleted = [row["id"] for row in cur.fetchall()]
+            self.notify(cur, "delete", deleted)
+            return deleted
+
+    def notify(self, cur, op, ids=(), row=None):
+        """Queue change events; Postgres only delivers them if the transaction commits"""
+        for payload in event_payloads(op, ids, row):
+            self.statements.execute(cur, "notify", (EVENTS_CHANNEL, payload))
+
+    def stats(self, bucket=10, source="summary"):
+        """Count, min/max/avg idade and an idade histogram; see stats_queries()"""
+        totals, histogram, params = stats_queries(bucket, source)
+        with self.cursor() as cur:
+            execute_observed(cur, "stats_totals", totals)
+            totals = cur.fetchone()
+            execute_observed(cur, "stats_histogram", histogram, params)
+            return stats_result(totals, cur.fetchall(), bucket)
+
+    def table_version(self):
+        """Counter bumped by a trigger on every write statement to minha_tabela"""
+        with self.cursor() as cur:
+            self.statements.execute(cur, "table_version")
+            return cur.fetchone()["version"]
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def statement_stats(self):
+        return self.statements.stats()
 
     def close(self):
-        self.cur.close()
-        self.conn.close()
+        self.pool.closeall()
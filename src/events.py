@@ -0,0 +1,135 @@
+import asyncio
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+from crud import EVENTS_CHANNEL, connect_kwargs
+
+
+class ChangeFeed:
+    """Fans out minha_tabela change events to any number of subscribers.
+
+    A single background thread LISTENs on EVENTS_CHANNEL and hands every
+    NOTIFY payload to the event loop, where it gets the next event id and
+    is pushed to each subscriber's queue. The last `history` events are
+    kept so a subscriber reconnecting with its last seen id can resume.
+
+    Event ids are "<stream>-<seq>", where the stream id is unique to this
+    process. A subscriber whose id belongs to another stream, or is older
+    than the retained history, receives a "reset" event instead and should
+    reload the full list.
+    """
+
+    def __init__(self, channel=EVENTS_CHANNEL, history=1000, queue_size=1000):
+        self.channel = channel
+        self.stream = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)  # (seq, payload)
+        self._seq = 0
+        self._subscribers = set()
+        self._loop = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, loop):
+        self._loop = loop
+        self._thread = threading.Thread(target=self._listen, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _listen(self):
+        connected_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**connect_kwargs())
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute("LISTEN %s" % self.channel)
+                if connected_before:
+                    # Notifications sent while we were disconnected are lost
+                    self._loop.call_soon_threadsafe(self._reset_all)
+                connected_before = True
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._loop.call_soon_threadsafe(self._publish, notify.payload)
+            except psycopg2.Error:
+                time.sleep(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _event_id(self, seq):
+        return "%s-%d" % (self.stream, seq)
+
+    def _publish(self, payload):
+        self._seq += 1
+        event = (self._event_id(self._seq), "change", payload)
+        self._history.append((self._seq, payload))
+        for queue in list(self._subscribers):
+            self._offer(queue, event)
+
+    def _reset_all(self):
+        for queue in list(self._subscribers):
+            self._offer(queue, (None, "reset", "{}"))
+
+    def _offer(self, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow subscriber: drop its backlog and tell it to reload
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait((None, "reset", "{}"))
+
+    def _replay(self, last_event_id):
+        """Events after `last_event_id`, or a reset if they are no longer available"""
+        stream, _, seq = (last_event_id or "").partition("-")
+        if stream != self.stream or not seq.isdigit():
+            return [(None, "reset", "{}")]
+        seq = int(seq)
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if seq < oldest - 1:
+            return [(None, "reset", "{}")]
+        return [(self._event_id(s), "change", payload) for s, payload in self._history if s > seq]
+
+    async def subscribe(self, last_event_id=None, heartbeat=15.0):
+        """Yield (event id, event type, JSON data) tuples until the consumer stops.
+
+        Yields None when nothing happened for `heartbeat` seconds, so the
+        consumer can send a keep-alive and notice a closed connection.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # Registering and replaying happen without yielding to the loop, so no event is missed or repeated
+        self._subscribers.add(queue)
+        try:
+            if last_event_id:
+                for event in self._replay(last_event_id):
+                    self._offer(queue, event)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self):
+        return {
+            "stream": self.stream,
+            "last_event_id": self._event_id(self._seq),
+            "subscribers": len(self._subscribers),
+            "history": len(self._history),
+        }
@@ -0,0 +1,113 @@
+"""Wire formats of /items pages, shared by the API and its clients.
+
+Besides plain JSON ({"items": [row, ...], "next_cursor": ...}) the list
+endpoints can send the same page column by column, so the keys are not
+repeated in every row:
+
+    {"columns": {"id": [...], "nome": [...], "idade": [...]}, "next_cursor": ...}
+
+encoded either as JSON or as MessagePack. Nothing here depends on FastAPI
+or psycopg2, so the GUIs and SDKs can import it.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is only offered when installed
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.minha-tabela.columnar+json"
+MSGPACK = "application/msgpack"
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+
+def dumps(content) -> bytes:
+    """Encode plain rows (dicts of str/int) straight to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(content: bytes):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def compact_formats():
+    """Columnar media types available in this process, most compact first"""
+    return [MSGPACK, COLUMNAR_JSON] if msgpack is not None else [COLUMNAR_JSON]
+
+
+def to_columns(rows, columns):
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+def from_columns(columns):
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def columnar_page(page, columns):
+    return {"columns": to_columns(page["items"], columns), "next_cursor": page["next_cursor"]}
+
+
+def encode(content, media_type) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(content)
+    return dumps(content)
+
+
+def negotiate(accept, offered):
+    """Pick the entry of `offered` the Accept header prefers; the first one when nothing matches.
+
+    Ties keep the order of `offered`, so the server's preference decides
+    between types the client weighs the same.
+    """
+    if not accept:
+        return offered[0]
+    weights = {}
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[media_type.lower()] = quality
+    best, best_quality = offered[0], 0.0
+    for media_type in offered:
+        major = media_type.split("/")[0]
+        quality = weights.get(media_type, weights.get(major + "/*", weights.get("*/*", 0.0)))
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def decode_page(content: bytes, content_type, columns=False):
+    """Decode a list response of any format.
+
+    Returns the usual {"items": [...], "next_cursor": ...} page, or the
+    columnar page when `columns` is true. Other bodies (errors) are
+    returned as decoded.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    data = msgpack.unpackb(content) if media_type == MSGPACK else loads(content)
+    if not isinstance(data, dict):
+        return data
+    if "columns" in data and not columns:
+        return {"items": from_columns(data["columns"]), "next_cursor": data["next_cursor"]}
+    if "items" in data and columns:
+        names = list(data["items"][0]) if data["items"] else []
+        return {"columns": to_columns(data["items"], names), "next_cursor": data["next_cursor"]}
+    return data
@@ -1,68 +1,451 @@
-from fastapi import FastAPI, Depends, Query, Body
-from typing import Optional
-from crud import Database
-from models import ItemCreate, ItemUpdate, ResponseMessage, Item
+from fastapi import FastAPI, Depends, Query, Body, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+from typing import Optional, Literal, List
+import csv
+import io
+import json
+import os
+import zlib
+from crud import Database, COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_STATS_BUCKET, page_cursor, parse_cursor
+from schema import migrate
+from events import ChangeFeed
+from cache import TTLCache
+from serialization import FastJSONResponse, ColumnarResponse, dumps
+from compression import CompressionMiddleware
+import formats
+from async_crud import create_engine, AsyncDatabase
+from metrics import REGISTRY, MetricsMiddleware, record_pool
+import profiling
+from pydantic import ValidationError
+from models import (
+    ItemCreate, ItemUpdate, ItemPatch, ResponseMessage, Item, ItemPage,
+    ItemResponse, BulkInsertResponse, BulkResult, ItemStats,
+)
 
-app = FastAPI()
+# Serialize list responses with FastJSONResponse instead of the response_model path
+FAST_JSON = os.environ.get("FAST_JSON", "1") == "1"
+# Records validated and written per batch by POST /items/bulk
+BULK_CHUNK_SIZE = 1000
+
+migrate()
 db = Database()
+# Engine behind the /items routes, selected with DB_ENGINE=sync|async
+engine = create_engine(db)
+# Read-through cache for GET /items/{item_id}, invalidated by every write path
+item_cache = TTLCache(
+    maxsize=int(os.environ.get("ITEM_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("ITEM_CACHE_TTL", 60)),
+)
+# LISTEN connection fanning out NOTIFY events to /items/events subscribers
+change_feed = ChangeFeed()
+# Always-on low-rate stack sampler, enabled with PROFILE_SAMPLE_HZ > 0
+sampler = profiling.ContinuousSampler() if profiling.PROFILE_SAMPLE_HZ > 0 else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await engine.connect()
+    change_feed.start(asyncio.get_running_loop())
+    if sampler is not None:
+        sampler.start()
+    yield
+    if sampler is not None:
+        sampler.stop()
+    change_feed.stop()
+    await engine.close()
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
+# Responses of at least COMPRESSION_MIN_SIZE bytes are sent with brotli or gzip, as the client accepts
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", 1024)))
+# Requests carrying PROFILE_TOKEN are sampled; without a token the middleware is not installed
+if profiling.PROFILE_TOKEN is not None:
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Outermost, so request timings include compression
+app.add_middleware(MetricsMiddleware)
+
+def decode_cursor(after: Optional[str], sort: str = "id"):
+    """Turn the opaque `after` cursor back into the last seen id, or (sort value, id)"""
+    if after is None:
+        return None
+    try:
+        return parse_cursor(after, sort)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def parse_fields(fields: Optional[str]):
+    """Columns asked for with ?fields=nome,idade, in table order"""
+    if not fields:
+        return COLUMNS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(COLUMNS)
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail="Campos inválidos: " + ", ".join(sorted(unknown)))
+    return tuple(name for name in COLUMNS if name in requested)
+
+def list_format(request: Request) -> str:
+    """Media type of a list response, negotiated from the Accept header"""
+    return formats.negotiate(request.headers.get("accept"), [formats.JSON] + formats.compact_formats())
+
+def make_etag(version: int, request: Request, media_type: str = formats.JSON) -> str:
+    """Weak ETag of a list response: the table version plus a hash of route, query and format"""
+    key = repr((request.url.path, sorted(request.query_params.multi_items()), media_type))
+    return f'W/"{version}-{zlib.crc32(key.encode()):08x}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of `etag` against the If-None-Match header"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def cache_headers(etag: str):
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+def make_page(rows, limit: int, response: Response, etag: str, media_type: str = formats.JSON,
+              sort: str = "id", fields=COLUMNS):
+    """Build a page from up to limit + 1 rows; the extra row only signals a next page"""
+    items = rows[:limit]
+    next_cursor = page_cursor(items[-1], sort) if len(rows) > limit else None
+    if fields != COLUMNS:
+        items = [{name: row[name] for name in fields} for row in items]
+    page = {"items": items, "next_cursor": next_cursor}
+    if media_type != formats.JSON:
+        return ColumnarResponse(page, fields, media_type, headers=cache_headers(etag))
+    if FAST_JSON or fields != COLUMNS:
+        # Rows already have the Item shape (projected rows never do), so the encoder walk is skipped
+        return FastJSONResponse(page, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+    return page
+
+@app.get("/select", response_model=ItemPage)
+def get_data(request: Request, response: Response, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1), after: Optional[str] = None):
+    """ Get a page of records using original endpoint"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    after_id = decode_cursor(after)
+    media_type = list_format(request)
+    # The version is read before the rows, so a concurrent write can only make the ETag too old, never too new
+    etag = make_etag(db.table_version(), request, media_type)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return make_page(db.select_page(limit + 1, after_id), limit, response, etag, media_type)
+
+@app.get("/items", response_model=ItemPage)
+async def get_items(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1),
+    after: Optional[str] = None,
+    nome: Optional[str] = Query(None, description="Prefixo do nome (sem diferenciar maiúsculas)"),
+    q: Optional[str] = Query(None, description="Trecho do nome (sem diferenciar maiúsculas)"),
+    idade_min: Optional[int] = None,
+    idade_max: Optional[int] = None,
+    sort: Literal["id", "-id", "nome", "-nome", "idade", "-idade"] = "id",
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula, ex.: nome,idade"),
+):
+    """ Get a page of records using REST endpoint, optionally filtered, sorted and projected"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    cursor = decode_cursor(after, sort)
+    columns = parse_fields(fields)
+    media_type = list_format(request)
+    etag = make_etag(await engine.table_version(), request, media_type)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    if nome or q or idade_min is not None or idade_max is not None or sort != "id" or columns != COLUMNS:
+        rows = await engine.search(
+            limit + 1, cursor, nome=nome, q=q, idade_min=idade_min, idade_max=idade_max, sort=sort, fields=columns,
+        )
+    else:
+        # Unfiltered listing keeps the prepared keyset statement
+        rows = await engine.select_page(limit + 1, cursor)
+    return make_page(rows, limit, response, etag, media_type, sort, columns)
+
+def ndjson_chunks(batches):
+    """One NDJSON chunk per batch of rows"""
+    for rows in batches:
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+def csv_chunks(batches):
+    """A header chunk followed by one CSV chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([row[column] for column in COLUMNS] for row in rows)
+        yield buffer.getvalue()
+
+def msgpack_chunks(batches):
+    """One MessagePack map of columns per batch of rows, read back with msgpack.Unpacker"""
+    for rows in batches:
+        yield formats.encode(formats.to_columns(rows, COLUMNS), formats.MSGPACK)
+
+EXPORT_FORMATS = {"ndjson": formats.NDJSON, "csv": formats.CSV, "msgpack": formats.MSGPACK}
+
+@app.get("/items/export")
+def export_items(request: Request, format: Optional[Literal["ndjson", "csv", "msgpack"]] = None):
+    """ Stream every record as NDJSON, CSV or MessagePack using a server-side cursor.
+
+    Without `format`, the format is negotiated from the Accept header.
+    """
+    if format is None:
+        offered = [formats.NDJSON, formats.CSV] + ([formats.MSGPACK] if formats.msgpack is not None else [])
+        media_type = formats.negotiate(request.headers.get("accept"), offered)
+        format = next(name for name, value in EXPORT_FORMATS.items() if value == media_type)
+    if format == "msgpack" and formats.msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack não está disponível")
+    batches = db.iter_rows()
+    if format == "msgpack":
+        return StreamingResponse(msgpack_chunks(batches), media_type=formats.MSGPACK)
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(batches),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="minha_tabela.csv"'},
+        )
+    return StreamingResponse(ndjson_chunks(batches), media_type="application/x-ndjson")
 
-@app.get("/select")
-def get_data():
-    """ Get all records using original endpoint"""
-    return db.select_all()
+@app.get("/items/stats", response_model=ItemStats)
+async def get_item_stats(
+    request: Request,
+    bucket: int = Query(10, ge=1, le=MAX_STATS_BUCKET, description="Largura das faixas de idade do histograma"),
+    source: Literal["summary", "table"] = "summary",
+):
+    """ Count, min/max/avg idade and an idade histogram.
 
-@app.get("/items")
-def get_items():
-    """ Get all records using REST endpoint"""
-    return db.select_all()
+    Served from the trigger-maintained per-idade counts by default;
+    `source=table` computes the same numbers from minha_tabela.
+    """
+    etag = make_etag(await engine.table_version(), request)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return FastJSONResponse(await engine.stats(bucket, source), headers=cache_headers(etag))
+
+async def sse_stream(request: Request, last_event_id: Optional[str]):
+    """Server-Sent Events framing of the change feed"""
+    events = change_feed.subscribe(last_event_id)
+    try:
+        async for event in events:
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, kind, data = event
+            head = f"id: {event_id}\n" if event_id else ""
+            yield f"{head}event: {kind}\ndata: {data}\n\n"
+    finally:
+        await events.aclose()
+
+@app.get("/items/events")
+async def item_events(request: Request, last_event_id: Optional[str] = Header(None), after: Optional[str] = None):
+    """ Server-Sent Events stream of insert/update/delete changes.
+
+    Reconnecting clients resume from the Last-Event-ID header (or `after`);
+    a "reset" event means the missed changes are gone and the list must be reloaded.
+    """
+    return StreamingResponse(
+        sse_stream(request, last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # Query_param
 @app.post("/insert")
 def insert_data_query(nome: str, idade: int):
     """ Create record with query parameters (original method)"""
-    db.insert_data(nome, idade)
-    return {"message": "Dados inseridos com sucesso!"}
+    row = db.insert_data(nome, idade)
+    return {"message": "Dados inseridos com sucesso!", "id": row["id"]}
 
 
 # JSON_param
-@app.post("/items")
-def insert_data_json(item: ItemCreate):
+@app.post("/items", response_model=ItemResponse)
+async def insert_data_json(item: ItemCreate):
     """ Create record with JSON body (REST method)"""
-    db.insert_data(item.nome, item.idade)
-    return ResponseMessage(message="Dados inseridos com sucesso!")
+    row = await engine.insert_data(item.nome, item.idade)
+    return ItemResponse(message="Dados inseridos com sucesso!", item=row)
+
+async def read_bulk_records(request: Request):
+    """Yield the records of a JSON array body, or of an NDJSON body line by line"""
+    if "ndjson" in request.headers.get("content-type", ""):
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        if buffer.strip():
+            yield json.loads(buffer)
+        return
+    records = await request.json()
+    if not isinstance(records, list):
+        raise HTTPException(status_code=422, detail="Esperado um array JSON de registros")
+    for record in records:
+        yield record
+
+def validate_chunk(records, offset: int):
+    """Validate one chunk of raw records as ItemCreate, reporting the failing index"""
+    rows = []
+    for index, record in enumerate(records, start=offset):
+        if not isinstance(record, dict):
+            raise HTTPException(status_code=422, detail={"index": index, "errors": "Esperado um objeto JSON"})
+        try:
+            item = ItemCreate(**record)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail={"index": index, "errors": e.errors()})
+        rows.append((item.nome, item.idade))
+    return rows
+
+@app.post("/items/bulk", response_model=BulkInsertResponse)
+async def insert_bulk(request: Request):
+    """ Create many records from a JSON array or NDJSON body in one transaction"""
+    rows = []
+    chunk = []
+    try:
+        async for record in read_bulk_records(request):
+            chunk.append(record)
+            if len(chunk) == BULK_CHUNK_SIZE:
+                rows.extend(validate_chunk(chunk, len(rows)))
+                chunk = []
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+    rows.extend(validate_chunk(chunk, len(rows)))
+
+    ids = await engine.insert_many(rows, page_size=BULK_CHUNK_SIZE) if rows else []
+    return BulkInsertResponse(message=f"{len(ids)} registros inseridos com sucesso!", ids=ids)
 
 # Query_param
 @app.put("/update")
 def update_data_query(id: int, nome: str, idade: int):
     """ Update record with query parameters (original method)"""
     db.update_data(id, nome, idade)
+    item_cache.invalidate(id)
     return {"message": "Dados atualizados com sucesso!"}
 
+def bulk_outcomes(ids, done, status: str):
+    """Per-id outcome for a bulk request, in request order"""
+    done = set(done)
+    return [{"id": id, "status": status if id in done else "not_found"} for id in ids]
+
+@app.patch("/items/bulk", response_model=BulkResult)
+async def update_bulk(items: List[ItemPatch]):
+    """ Update many records in one statement; omitted fields keep their value"""
+    ids = [item.id for item in items]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=422, detail="IDs duplicados na requisição")
+    updated = await engine.update_many([(item.id, item.nome, item.idade) for item in items]) if items else []
+    item_cache.invalidate(*updated)
+    return BulkResult(
+        message=f"{len(updated)} registros atualizados com sucesso!",
+        results=bulk_outcomes(ids, updated, "updated"),
+    )
+
+@app.delete("/items/bulk", response_model=BulkResult)
+async def delete_bulk(ids: List[int] = Body(...)):
+    """ Delete many records in one statement"""
+    ids = list(dict.fromkeys(ids))
+    deleted = await engine.delete_many(ids) if ids else []
+    item_cache.invalidate(*deleted)
+    return BulkResult(
+        message=f"{len(deleted)} registros deletados!",
+        results=bulk_outcomes(ids, deleted, "deleted"),
+    )
+
+@app.get("/db/stats")
+def get_db_stats():
+    """ Connection pool and prepared statement statistics of the psycopg2 engine"""
+    return {"pool": db.pool_stats(), "statements": db.statement_stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """ Prometheus metrics: requests, SQL statements and connection pools"""
+    record_pool("psycopg2", db.pool_stats())
+    if isinstance(engine, AsyncDatabase):
+        record_pool("asyncpg", await engine.pool_stats())
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """ Hit/miss/eviction counters of the item cache"""
+    return item_cache.stats()
+
+def require_profile_token(x_profile: Optional[str] = Header(None), profile: Optional[str] = None):
+    """Debug routes answer 404 unless the request carries PROFILE_TOKEN"""
+    if not profiling.authorized(x_profile or profile):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+def get_profile(profile_id: str):
+    """ Folded stacks of a profiled request, by its X-Profile-Id"""
+    path = profiling.profile_path(profile_id)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Perfil não encontrado!")
+    return Response(path.read_bytes(), media_type="text/plain; charset=utf-8")
+
+@app.get("/debug/profile/hot", dependencies=[Depends(require_profile_token)])
+def get_hot_stacks(limit: Optional[int] = Query(None, ge=1), format: Literal["folded", "json"] = "folded"):
+    """ Hottest stacks seen by the continuous sampler since startup"""
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Amostragem contínua desativada (PROFILE_SAMPLE_HZ)")
+    stacks = sampler.snapshot(limit)
+    if format == "json":
+        return {
+            "samples": sampler.samples,
+            "hz": 1.0 / sampler.interval,
+            "since": sampler.started,
+            "stacks": [{"stack": stack, "samples": count} for stack, count in stacks],
+        }
+    return Response("".join("%s %d\n" % entry for entry in stacks), media_type="text/plain; charset=utf-8")
+
+@app.get("/items/{item_id}", response_model=Item)
+async def get_item(item_id: int):
+    """ Get a single record, served from the item cache when possible"""
+    row = item_cache.get(item_id)
+    if row is None:
+        generation = item_cache.generation
+        row = await engine.select_by_id(item_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Registro não encontrado!")
+        item_cache.set(item_id, row, generation)
+    return row
+
 # JSON_param
 @app.put("/items/{item_id}")
-def update_data_json(item_id: int, item: ItemUpdate):
+async def update_data_json(item_id: int, item: ItemUpdate):
     """ Update record with JSON body (REST method)"""
-    # Only update fields that were provided
-    current_data = db.select_by_id(item_id)
-    if not current_data:
+    # Only fields that were provided are changed, in a single statement
+    row = await engine.update_data(item_id, item.nome, item.idade)
+    item_cache.invalidate(item_id)
+    if not row:
         return {"message": "Registro não encontrado!"}
-        
-    nome = item.nome if item.nome is not None else current_data["nome"]
-    idade = item.idade if item.idade is not None else current_data["idade"]
-    
-    db.update_data(item_id, nome, idade)
     return ResponseMessage(message="Dados atualizados com sucesso!")
 
+@app.patch("/items/{item_id}", response_model=Item)
+async def patch_item(item_id: int, item: ItemUpdate):
+    """ Partially update a record and return it (REST method)"""
+    row = await engine.update_data(item_id, item.nome, item.idade)
+    item_cache.invalidate(item_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Registro não encontrado!")
+    return row
+
 # Query_param
 @app.delete("/delete")
 def delete_data_query(id: int):
     """Delete record with query parameter (original method)"""
     db.delete_data(id)
+    item_cache.invalidate(id)
     return {"message": "Registro deletado!"}
 
 # JSON_param
 @app.delete("/items/{item_id}")
-def delete_data_json(item_id: int):
+async def delete_data_json(item_id: int):
     """Delete record with path parameter (REST method)"""
-    db.delete_data(item_id)
+    await engine.delete_data(item_id)
+    item_cache.invalidate(item_id)
     return ResponseMessage(message="Registro deletado!")
\ No newline at end of file
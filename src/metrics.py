@@ -0,0 +1,219 @@
+"""Prometheus metrics for the API and the data layer.
+
+A small in-process registry rendered in the Prometheus text format by
+GET /metrics, so no client library is needed. crud.py and async_crud.py
+report every statement through observe_query(); MetricsMiddleware times
+every request. Statements slower than SLOW_QUERY_MS (default 500, 0 to
+turn it off) are also logged to the "slow_query" logger with their SQL
+and the shape of their parameters, never the values.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from profiling import record_query
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_MS", 500)) / 1000
+slow_query_log = logging.getLogger("slow_query")
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join('%s="%s"' % (name, value) for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, *labels, value):
+        """Publish a total kept elsewhere, e.g. a pool's cumulative checkouts"""
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            "%s%s %s" % (self.name, format_labels(self.labelnames, labels), format_value(value))
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = format_labels(self.labelnames, labels, [("le", format_value(bound))])
+                lines.append("%s_bucket%s %d" % (self.name, le, cumulative))
+            label_text = format_labels(self.labelnames, labels)
+            lines.append("%s_sum%s %s" % (self.name, label_text, format_value(total)))
+            lines.append("%s_count%s %d" % (self.name, label_text, count))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status")))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time until the last response byte was sent", ("method", "route", "status")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method",)))
+DB_QUERY_LATENCY = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("statement",)))
+DB_QUERY_ROWS = REGISTRY.register(Counter(
+    "db_query_rows_total", "Rows returned or affected by SQL statements", ("statement",)))
+DB_SLOW_QUERIES = REGISTRY.register(Counter(
+    "db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ("statement",)))
+DB_POOL = REGISTRY.register(Gauge(
+    "db_pool_connections", "Connections of the database pools by state", ("engine", "state")))
+DB_POOL_EVENTS = REGISTRY.register(Counter(
+    "db_pool_events_total", "Cumulative pool checkouts, waits, timeouts and reconnects", ("engine", "event")))
+
+
+def params_shape(params):
+    """Types (and lengths of strings and arrays) of query parameters, without their values"""
+    def shape(value):
+        if isinstance(value, (list, tuple)):
+            inner = sorted({type(item).__name__ for item in value}) or ["empty"]
+            return "%s[%s](%d)" % (type(value).__name__, "|".join(inner), len(value))
+        if isinstance(value, str):
+            return "str(%d)" % len(value)
+        return type(value).__name__
+    if isinstance(params, dict):
+        return {key: shape(value) for key, value in params.items()}
+    return [shape(value) for value in params or ()]
+
+
+def observe_query(statement, seconds, rows=None, sql=None, params=None):
+    """Record one SQL statement; log it when it crosses the slow-query threshold"""
+    DB_QUERY_LATENCY.observe(seconds, statement)
+    record_query(statement, seconds)
+    if rows is not None and rows >= 0:
+        DB_QUERY_ROWS.inc(statement, amount=rows)
+    if SLOW_QUERY_SECONDS > 0 and seconds >= SLOW_QUERY_SECONDS:
+        DB_SLOW_QUERIES.inc(statement)
+        slow_query_log.warning(
+            "slow query %s: %.1f ms, %s rows, params %s, sql: %s",
+            statement, seconds * 1000, rows if rows is not None else "?", params_shape(params), sql,
+        )
+
+
+def record_pool(engine, stats):
+    """Publish a pool_stats() snapshot"""
+    for state in ("size", "idle", "in_use", "minconn", "maxconn"):
+        if state in stats:
+            DB_POOL.set(engine, state, value=stats[state])
+    for event in ("checkouts", "waits", "timeouts", "reconnects"):
+        if event in stats:
+            DB_POOL_EVENTS.set(engine, event, value=stats[event])
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request by method, route template and status.
+
+    The route is read from the scope after routing, so /items/42 and
+    /items/7 share the "/items/{item_id}" series; unmatched paths are
+    grouped under "unmatched". Streaming responses are timed until their
+    last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(method, route, status)
+            HTTP_LATENCY.observe(elapsed, method, route, status)
@@ -12,11 +12,45 @@ class ItemUpdate(ItemBase):
     nome: Optional[str] = None
     idade: Optional[int] = None
 
+class ItemPatch(ItemUpdate):
+    id: int
+
 class Item(ItemBase):
     id: int
     
     class Config:
         orm_mode = True
 
+class ItemPage(BaseModel):
+    items: List[Item]
+    # Opaque cursor to pass as `after` for the next page, None on the last page
+    next_cursor: Optional[str] = None
+
 class ResponseMessage(BaseModel):
-    message: str
\ No newline at end of file
+    message: str
+
+class ItemResponse(ResponseMessage):
+    item: Item
+
+class BulkInsertResponse(ResponseMessage):
+    ids: List[int]
+
+class HistogramBucket(BaseModel):
+    idade_min: int
+    idade_max: int
+    count: int
+
+class ItemStats(BaseModel):
+    count: int
+    idade_min: Optional[int] = None
+    idade_max: Optional[int] = None
+    idade_avg: Optional[float] = None
+    histogram: List[HistogramBucket]
+
+class BulkOutcome(BaseModel):
+    id: int
+    # "updated", "deleted" or "not_found"
+    status: str
+
+class BulkResult(ResponseMessage):
+    results: List[BulkOutcome]
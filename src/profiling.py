@@ -0,0 +1,306 @@
+"""Sampling profiler for API requests.
+
+Two modes, both off unless configured:
+
+- On demand: when PROFILE_TOKEN is set, a request carrying it in the
+  X-Profile header (or a `profile` query parameter) is sampled every
+  PROFILE_INTERVAL_MS (default 1) while it runs. The samples are written
+  to PROFILE_DIR as a folded-stack file (flamegraph.pl, speedscope,
+  inferno). The response gets an X-Profile-Id header and a Server-Timing
+  header splitting the handler time into DB and Python CPU.
+- Continuous: with PROFILE_SAMPLE_HZ > 0, a background thread samples
+  every thread at that rate and aggregates the stacks that run this
+  project's code, served by GET /debug/profile/hot.
+
+Samples are weighted by the wall time since the previous sample, in
+microseconds, so flame graph widths are proportional to time. Threads
+inside a database call get a "[db]" leaf frame. asyncpg queries do not
+block a thread, so their time is added as "[db] <statement>" stacks from
+the query timings instead.
+
+A request only owns its event-loop task and the worker threads it starts
+through async_crud.ThreadedDatabase. Work that sync (def) routes do in
+FastAPI's threadpool appears in the DB totals but not in the samples.
+"""
+import asyncio
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", Path(__file__).resolve().parent.parent / "profiles"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 1)) / 1000
+PROFILE_SAMPLE_HZ = float(os.environ.get("PROFILE_SAMPLE_HZ", 0))
+
+SRC_DIR = str(Path(__file__).resolve().parent)
+# Deepest stacks kept, and distinct stacks aggregated by the continuous sampler
+MAX_DEPTH = 128
+MAX_STACKS = 5000
+PROFILE_ID = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{8}$")
+
+current_profile = ContextVar("current_profile", default=None)
+# Threads currently inside a database call
+_db_threads = set()
+
+
+@contextmanager
+def db_call():
+    """Mark the current thread as waiting on the database"""
+    ident = threading.get_ident()
+    _db_threads.add(ident)
+    try:
+        yield
+    finally:
+        _db_threads.discard(ident)
+
+
+def record_query(statement, seconds):
+    """Query timing hook (called by metrics.observe_query): attribute DB time to the profiled request"""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add_query(statement, seconds)
+
+
+def track_thread(func, *args, **kwargs):
+    """Run func in a worker thread, sampling it as part of the profiled request if there is one"""
+    profile = current_profile.get()
+    if profile is None:
+        return func(*args, **kwargs)
+    ident = threading.get_ident()
+    profile.threads.add(ident)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.threads.discard(ident)
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return "%s (%s)" % (code.co_name, os.path.basename(code.co_filename))
+
+
+def stack_of(frame):
+    """Root-first frame names, and whether the stack runs code from this project"""
+    names = []
+    ours = False
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame))
+        ours = ours or frame.f_code.co_filename.startswith(SRC_DIR)
+        frame = frame.f_back
+    names.reverse()
+    return names, ours
+
+
+def folded(stacks):
+    """Folded-stack text: one "frame;frame;frame weight" line per stack"""
+    return "".join("%s %d\n" % (stack, weight) for stack, weight in stacks.most_common() if weight > 0)
+
+
+class RequestProfile:
+    """Samples one request's event-loop task and worker threads until stopped"""
+
+    def __init__(self, label, interval=PROFILE_INTERVAL):
+        self.id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        self.label = label
+        self.interval = interval
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.loop_thread = threading.get_ident()
+        self.threads = set()
+        self.stacks = Counter()
+        self._lock = threading.Lock()  # stacks are added from the sampler and the loop thread
+        self.samples = 0
+        self.cpu_seconds = 0.0
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.started = time.perf_counter()
+        self.finished = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-" + self.id, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.finished = time.perf_counter()
+
+    def add_query(self, statement, seconds):
+        self.db_seconds += seconds
+        self.queries += 1
+        if threading.get_ident() == self.loop_thread:
+            # asyncpg: the task was suspended, so no sample saw this wait
+            with self._lock:
+                self.stacks["%s;[db] %s" % (self.label, statement)] += int(seconds * 1_000_000)
+
+    def _run(self):
+        previous = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight = now - previous
+            previous = now
+            frames = sys._current_frames()
+            self._sample_loop(frames, weight)
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._add(frame, weight, ident in _db_threads)
+
+    def _sample_loop(self, frames, weight):
+        try:
+            running = asyncio.current_task(self.loop) is self.task
+        except RuntimeError:
+            running = False
+        frame = frames.get(self.loop_thread)
+        if running and frame is not None:
+            self._add(frame, weight, self.loop_thread in _db_threads)
+
+    def _add(self, frame, weight, in_db):
+        names, _ = stack_of(frame)
+        if in_db:
+            names.append("[db]")
+        else:
+            self.cpu_seconds += weight
+        self.samples += 1
+        with self._lock:
+            self.stacks[";".join([self.label] + names)] += int(weight * 1_000_000)
+
+    def summary(self, until=None):
+        wall = (until or self.finished or time.perf_counter()) - self.started
+        return {
+            "id": self.id,
+            "wall_ms": wall * 1000,
+            "db_ms": self.db_seconds * 1000,
+            "cpu_ms": self.cpu_seconds * 1000,
+            "queries": self.queries,
+            "samples": self.samples,
+        }
+
+    def server_timing(self):
+        summary = self.summary(until=time.perf_counter())
+        return "total;dur=%.1f, db;dur=%.1f, cpu;desc=\"python\";dur=%.1f" % (
+            summary["wall_ms"], summary["db_ms"], summary["cpu_ms"],
+        )
+
+    def save(self, directory=PROFILE_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / (self.id + ".folded")
+        with self._lock:
+            path.write_text(folded(self.stacks))
+        return path
+
+
+class ContinuousSampler:
+    """Low-rate sampler aggregating the stacks of every thread running project code"""
+
+    def __init__(self, hz=PROFILE_SAMPLE_HZ):
+        self.interval = 1.0 / hz
+        self.stacks = Counter()
+        self._lock = threading.Lock()  # snapshot() reads stacks while the sampler adds to them
+        self.samples = 0
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                names, ours = stack_of(frame)
+                if not ours:
+                    continue
+                if ident in _db_threads:
+                    names.append("[db]")
+                stack = ";".join(names)
+                with self._lock:
+                    if stack not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                        stack = "[other]"
+                    self.stacks[stack] += 1
+                    self.samples += 1
+
+    def snapshot(self, limit=None):
+        """Hottest stacks first, as (folded stack, sample count)"""
+        with self._lock:
+            stacks = Counter(self.stacks)
+        return stacks.most_common(limit)
+
+
+def profile_path(profile_id):
+    """Folded file of a saved profile, or None for anything that is not a profile id"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    return PROFILE_DIR / (profile_id + ".folded")
+
+
+def authorized(value):
+    # compare_digest only accepts ASCII str, so compare the encoded bytes
+    return PROFILE_TOKEN is not None and value is not None and hmac.compare_digest(
+        value.encode(), PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry PROFILE_TOKEN; others pay one header lookup"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/") or not authorized(self._token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile("%s %s" % (scope["method"], scope["path"]))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            # Joining the sampler and writing the file would block the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self._finish, profile)
+
+    @staticmethod
+    def _finish(profile):
+        profile.stop()
+        profile.save()
+
+    @staticmethod
+    def _token(scope):
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value.decode("latin-1")
+        if b"profile=" in scope.get("query_string", b""):
+            from urllib.parse import parse_qs
+            values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+            return values[0] if values else None
+        return None
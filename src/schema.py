@@ -0,0 +1,236 @@
+"""Schema migrations for minha_tabela.
+
+Each migration runs once and is recorded in schema_migrations. main.py
+applies pending migrations at startup; they can also be applied by hand:
+
+    python schema.py
+
+`python schema.py check` runs EXPLAIN on the GET /items search queries and
+fails if one of them cannot use its index.
+"""
+import sys
+import psycopg2
+from crud import connect_kwargs, search_query
+
+# Arbitrary key for the advisory lock that serializes concurrent migrators
+MIGRATION_LOCK_ID = 7_214_001
+
+MIGRATIONS = [
+    ("0001_minha_tabela", """
+        CREATE TABLE IF NOT EXISTS minha_tabela (
+            id SERIAL PRIMARY KEY,
+            nome VARCHAR(100) NOT NULL,
+            idade INTEGER NOT NULL
+        );
+    """),
+    # Version counter bumped once per write statement, used for the ETag of
+    # GET /items. It is updated inside the writing transaction, so readers
+    # never see a new version before the rows it stands for are committed.
+    # The price: each writer holds the single version row lock until its
+    # COMMIT (WAL flush included), so writes to minha_tabela commit one at a
+    # time and cannot share a group commit. Write throughput is capped near
+    # 1 / commit latency whatever the pool size; the writers_x* scenarios of
+    # benchmarks/load.py measure it.
+    ("0002_table_version", """
+        CREATE TABLE IF NOT EXISTS table_version (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO table_version (table_name) VALUES ('minha_tabela')
+        ON CONFLICT (table_name) DO NOTHING;
+
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_version SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS minha_tabela_version ON minha_tabela;
+        CREATE TRIGGER minha_tabela_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON minha_tabela
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+    """),
+    # Indexes behind the GET /items filters and sorts (see crud.search_query).
+    # Plain CREATE INDEX because migrations run in a transaction; on a large
+    # live table, create them CONCURRENTLY by hand before deploying.
+    ("0003_search_indexes", """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        -- nome prefix: lower(nome) LIKE 'ana%'
+        CREATE INDEX IF NOT EXISTS minha_tabela_nome_prefix_idx
+            ON minha_tabela (lower(nome) text_pattern_ops);
+        -- nome substring: nome ILIKE '%ana%'
+        CREATE INDEX IF NOT EXISTS minha_tabela_nome_trgm_idx
+            ON minha_tabela USING gin (nome gin_trgm_ops);
+        -- idade ranges and keyset pages sorted by nome or idade, both directions
+        CREATE INDEX IF NOT EXISTS minha_tabela_nome_id_idx ON minha_tabela (nome, id);
+        CREATE INDEX IF NOT EXISTS minha_tabela_idade_id_idx ON minha_tabela (idade, id);
+    """),
+    # Row count per idade behind GET /items/stats, kept in step with
+    # minha_tabela by statement-level triggers reading the transition tables,
+    # so a bulk write costs one upsert per distinct idade it touches.
+    # Postgres only allows transition tables on single-event triggers, hence
+    # one trigger per operation.
+    ("0004_item_stats", """
+        CREATE TABLE IF NOT EXISTS minha_tabela_idade_counts (
+            idade INTEGER PRIMARY KEY,
+            count BIGINT NOT NULL
+        );
+        -- Hold off writers until the triggers exist, so the backfill misses nothing
+        LOCK TABLE minha_tabela IN SHARE ROW EXCLUSIVE MODE;
+        TRUNCATE minha_tabela_idade_counts;
+        INSERT INTO minha_tabela_idade_counts (idade, count)
+        SELECT idade, count(*) FROM minha_tabela GROUP BY idade;
+
+        CREATE OR REPLACE FUNCTION minha_tabela_counts_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO minha_tabela_idade_counts AS c (idade, count)
+                SELECT idade, -count(*) FROM old_rows GROUP BY idade
+                ON CONFLICT (idade) DO UPDATE SET count = c.count + EXCLUDED.count;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO minha_tabela_idade_counts AS c (idade, count)
+                SELECT idade, count(*) FROM new_rows GROUP BY idade
+                ON CONFLICT (idade) DO UPDATE SET count = c.count + EXCLUDED.count;
+            END IF;
+            DELETE FROM minha_tabela_idade_counts WHERE count = 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION minha_tabela_counts_clear() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM minha_tabela_idade_counts;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS minha_tabela_counts_insert ON minha_tabela;
+        CREATE TRIGGER minha_tabela_counts_insert
+        AFTER INSERT ON minha_tabela REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION minha_tabela_counts_apply();
+
+        DROP TRIGGER IF EXISTS minha_tabela_counts_update ON minha_tabela;
+        CREATE TRIGGER minha_tabela_counts_update
+        AFTER UPDATE ON minha_tabela REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION minha_tabela_counts_apply();
+
+        DROP TRIGGER IF EXISTS minha_tabela_counts_delete ON minha_tabela;
+        CREATE TRIGGER minha_tabela_counts_delete
+        AFTER DELETE ON minha_tabela REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION minha_tabela_counts_apply();
+
+        DROP TRIGGER IF EXISTS minha_tabela_counts_truncate ON minha_tabela;
+        CREATE TRIGGER minha_tabela_counts_truncate
+        AFTER TRUNCATE ON minha_tabela
+        FOR EACH STATEMENT EXECUTE FUNCTION minha_tabela_counts_clear();
+    """),
+    # Take the count row locks in one order so concurrent writers cannot
+    # deadlock: one upsert of net deltas sorted by idade, instead of old_rows
+    # then new_rows. AFTER STATEMENT triggers fire in name order, so the
+    # version trigger is renamed to sort before minha_tabela_counts_* and
+    # every write statement locks the version row first.
+    ("0005_item_stats_lock_order", """
+        CREATE OR REPLACE FUNCTION minha_tabela_counts_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO minha_tabela_idade_counts AS c (idade, count)
+                SELECT idade, count(*) FROM new_rows GROUP BY idade ORDER BY idade
+                ON CONFLICT (idade) DO UPDATE SET count = c.count + EXCLUDED.count;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO minha_tabela_idade_counts AS c (idade, count)
+                SELECT idade, -count(*) FROM old_rows GROUP BY idade ORDER BY idade
+                ON CONFLICT (idade) DO UPDATE SET count = c.count + EXCLUDED.count;
+            ELSE
+                INSERT INTO minha_tabela_idade_counts AS c (idade, count)
+                SELECT idade, sum(delta) FROM (
+                    SELECT idade, -1 AS delta FROM old_rows
+                    UNION ALL
+                    SELECT idade, 1 AS delta FROM new_rows
+                ) AS changes
+                GROUP BY idade HAVING sum(delta) <> 0 ORDER BY idade
+                ON CONFLICT (idade) DO UPDATE SET count = c.count + EXCLUDED.count;
+            END IF;
+            DELETE FROM minha_tabela_idade_counts WHERE count = 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS minha_tabela_version ON minha_tabela;
+        DROP TRIGGER IF EXISTS minha_tabela_bump_version ON minha_tabela;
+        CREATE TRIGGER minha_tabela_bump_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON minha_tabela
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+    """),
+]
+
+# (description, search_query() arguments, index the plan must use)
+INDEX_CHECKS = [
+    ("nome prefix", dict(nome="ana"), "minha_tabela_nome_prefix_idx"),
+    ("nome substring", dict(q="ana"), "minha_tabela_nome_trgm_idx"),
+    ("idade range", dict(idade_min=30, idade_max=40, sort="idade"), "minha_tabela_idade_id_idx"),
+    ("sort by nome", dict(sort="nome"), "minha_tabela_nome_id_idx"),
+    ("sort by nome, next page", dict(sort="-nome", after=("Ana", 10)), "minha_tabela_nome_id_idx"),
+    ("sort by idade", dict(sort="-idade"), "minha_tabela_idade_id_idx"),
+]
+
+
+def migrate():
+    """Apply pending migrations and return the names of the ones applied"""
+    conn = psycopg2.connect(**connect_kwargs())
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "name TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+            cur.execute("SELECT name FROM schema_migrations")
+            done = {row[0] for row in cur.fetchall()}
+            applied = []
+            for name, sql in MIGRATIONS:
+                if name in done:
+                    continue
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+                applied.append(name)
+        conn.commit()
+        return applied
+    finally:
+        conn.close()
+
+
+def check_indexes():
+    """EXPLAIN each INDEX_CHECKS query and return the ones whose plan skips the expected index.
+
+    Sequential scans are disabled for the check, so the result does not
+    depend on how many rows the table holds: a query is reported only if
+    the planner cannot use the index at all.
+    """
+    conn = psycopg2.connect(**connect_kwargs())
+    failures = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            for description, arguments, index in INDEX_CHECKS:
+                sql, params = search_query(100, **arguments)
+                cur.execute("EXPLAIN " + sql, params)
+                plan = "\n".join(row[0] for row in cur.fetchall())
+                if index not in plan:
+                    failures.append((description, index, plan))
+    finally:
+        conn.rollback()
+        conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["check"]:
+        failures = check_indexes()
+        for description, index, plan in failures:
+            print(f"{description}: expected {index}\n{plan}\n")
+        print(f"{len(INDEX_CHECKS) - len(failures)}/{len(INDEX_CHECKS)} search queries use their index")
+        sys.exit(1 if failures else 0)
+    applied = migrate()
+    print("Applied: " + ", ".join(applied) if applied else "Schema is up to date")
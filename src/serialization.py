@@ -0,0 +1,21 @@
+from fastapi.responses import JSONResponse, Response
+from formats import columnar_page, dumps, encode
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for known row shapes.
+
+    Routes return it directly, so FastAPI skips response_model validation and
+    the jsonable_encoder walk over every row; the content is encoded in one
+    call with orjson when it is installed.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class ColumnarResponse(Response):
+    """A page of rows sent column by column, as columnar JSON or MessagePack"""
+
+    def __init__(self, page, columns, media_type, **kwargs):
+        super().__init__(encode(columnar_page(page, columns), media_type), media_type=media_type, **kwargs)
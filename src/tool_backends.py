@@ -0,0 +1,119 @@
+import os
+from typing import Optional
+
+
+class HttpToolBackend:
+    """Agent tools backed by the REST API, through the shared ApiClient"""
+
+    def __init__(self, api=None):
+        if api is None:
+            from api_client import client as api
+        self.api = api
+
+    def list_items(self, limit: Optional[int] = None, after: Optional[str] = None, **filters):
+        return self.api.list_items(limit=limit, after=after, **filters)
+
+    def get_stats(self, bucket: Optional[int] = None):
+        return self.api.get_stats(bucket)
+
+    def get_item(self, item_id: int):
+        return self.api.get_item(item_id)
+
+    def create_item(self, nome: str, idade: int):
+        return self.api.create_item(nome, idade)
+
+    def update_item(self, item_id: int, nome: Optional[str] = None, idade: Optional[int] = None):
+        return self.api.update_item(item_id, nome=nome, idade=idade)
+
+    def delete_item(self, item_id: int):
+        return self.api.delete_item(item_id)
+
+
+class LocalToolBackend:
+    """Agent tools calling crud.Database directly, with no HTTP round trip.
+
+    Results have the same shape as the matching REST responses, so the
+    model sees the same data whichever backend is used. Pass the API's
+    Database and item cache when the agent runs in the same process as
+    main.py, so both share one connection pool and writes made by the
+    agent invalidate the cache the API reads from. Without a cache, every
+    get_item goes to the database.
+    """
+
+    def __init__(self, db=None, cache=None):
+        if db is None:
+            from crud import Database
+            db = Database()
+        self.db = db
+        self.cache = cache
+
+    def list_items(self, limit: Optional[int] = None, after: Optional[str] = None, sort: Optional[str] = None, **filters):
+        # crud (psycopg2, db.env) is only needed by this backend, not by the HTTP one
+        from crud import SORT_KEYS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_cursor, parse_cursor
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        sort = sort or "id"
+        if sort not in SORT_KEYS:
+            return {"detail": "Ordenação inválida"}
+        filters = {name: value for name, value in filters.items() if value is not None}
+        try:
+            cursor = parse_cursor(after, sort) if after is not None else None
+            if filters or sort != "id":
+                rows = self.db.search(limit + 1, cursor, sort=sort, **filters)
+            else:
+                rows = self.db.select_page(limit + 1, cursor)
+        except ValueError:
+            return {"detail": "Cursor inválido"}
+        items = rows[:limit]
+        next_cursor = page_cursor(items[-1], sort) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def get_stats(self, bucket: Optional[int] = None):
+        from crud import MAX_STATS_BUCKET
+        if bucket is not None and not 1 <= bucket <= MAX_STATS_BUCKET:
+            return {"detail": "Faixa inválida"}
+        return self.db.stats(bucket or 10)
+
+    def get_item(self, item_id: int):
+        row = self.cache.get(item_id) if self.cache is not None else None
+        if row is None:
+            generation = self.cache.generation if self.cache is not None else None
+            row = self.db.select_by_id(item_id)
+            if row is None:
+                return {"detail": "Registro não encontrado!"}
+            if self.cache is not None:
+                self.cache.set(item_id, row, generation)
+        return row
+
+    def create_item(self, nome: str, idade: int):
+        row = self.db.insert_data(nome, idade)
+        return {"message": "Dados inseridos com sucesso!", "item": row}
+
+    def update_item(self, item_id: int, nome: Optional[str] = None, idade: Optional[int] = None):
+        row = self.db.update_data(item_id, nome, idade)
+        self.invalidate(item_id)
+        if row is None:
+            return {"detail": "Registro não encontrado!"}
+        return row
+
+    def delete_item(self, item_id: int):
+        self.db.delete_data(item_id)
+        self.invalidate(item_id)
+        return {"message": "Registro deletado!"}
+
+    def invalidate(self, item_id):
+        if self.cache is not None:
+            self.cache.invalidate(item_id)
+
+
+def create_backend(kind=None, **kwargs):
+    """Select the backend of the agent tools: "http" (default) or "local"
+
+    Controlled by the AGENT_TOOL_BACKEND environment variable. "local" needs
+    the database settings from db.env, like main.py.
+    """
+    kind = kind or os.environ.get("AGENT_TOOL_BACKEND", "http")
+    if kind == "local":
+        return LocalToolBackend(**kwargs)
+    if kind == "http":
+        return HttpToolBackend(**kwargs)
+    raise ValueError("Unknown AGENT_TOOL_BACKEND: %r (expected 'http' or 'local')" % kind)